@@ -1,33 +1,72 @@
 """
 Enhanced Grid Circuit Simulator
 Features:
-- Click-drag wires on Manhattan grid
+- Click-drag wires on Manhattan grid (routed around parts and other wires)
 - Click to place resistors, batteries, lightbulbs, and switches
 - Adjustable voltage and resistance values
 - Visual lightbulb brightness based on power (catches fire if overloaded!)
+- Lightbulb filaments heat up: their resistance rises with voltage
 - Right-click components to edit values
 - Click switches to toggle on/off
 - Click on wires/nodes to probe voltage and current
 
 Controls:
-- 1 = Wire tool (click & drag)
+- 1 = Wire tool (click & drag, hold Shift for a plain L path)
 - 2 = Resistor tool (click to place)
 - 3 = Battery tool (click to place)
 - 4 = Lightbulb tool (click to place)
 - 5 = Switch tool (click to place, then click switch to toggle)
+- 6 = Capacitor tool (click to place)
+- 7 = Inductor tool (click to place)
 - E = Erase tool (click component or wire)
 - V = Voltage probe tool (click wire/node to see voltage)
 - I = Current probe tool (click wire to see current)
 - R = Run simulation
+- T = Start/stop transient (time-domain) simulation
 - C = Clear all
+- S / L = Save / load the board (circuit.circ)
+- J = Export the board as JSON (circuit.json)
+- A = AC sweep, Bode data of the voltage probes (bode.csv)
+- P = Frame profiler overlay on/off
+- Shift+P = Start/stop the per-frame trace (profile.csv)
 - Right-click = Edit component values
 - Scroll = Rotate component before placing
+
+Headless (no display needed):
+- python -m circuitsim solve netlist.json          (JSON results to stdout)
+- python -m circuitsim solve board.npz -o out.npz -f npz
+- python -m circuitsim solve circuit.circ             (boards saved from the editor)
+- python -m circuitsim solve netlists/ -o results/ -j 8   (process pool)
 """
 
+import os
+import gc
+import sys
+import copy
+import json
 import math
+import time
+import heapq
+import random
+import argparse
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keep headless stdout clean
 import pygame
 import numpy as np
 
+try:
+    import scipy.linalg as sla
+    import scipy.sparse as sp
+    import scipy.sparse.linalg as spla
+except ImportError:  # without scipy every circuit uses the dense solver
+    sla = None
+    sp = None
+    spla = None
+
 # Config
 W, H = 1200, 760
 PANEL_W = 320
@@ -40,6 +79,38 @@ WIRE_WIDTH = 4
 DEFAULT_R = 100.0
 DEFAULT_V = 9.0
 DEFAULT_BULB_R = 50.0
+DEFAULT_C = 0.01    # farads, big enough to watch a bulb fade through 100 ohms
+DEFAULT_L = 10.0    # henries
+
+# Transient animation: simulated seconds per step and steps per frame
+TRANSIENT_DT = 1.0 / 600
+TRANSIENT_STEPS_PER_FRAME = 10
+
+# MNA systems at least this big are factored with the sparse solver
+SPARSE_MIN_SIZE = 200
+# Dense MNA matrices whose reciprocal condition number is below this count as singular
+RCOND_MIN = 1e-14
+
+# Lightbulb filaments: lb.ohms is the cold resistance and a lit filament follows
+# R(v) = ohms * (1 + (v / BULB_HOT_VOLTS)^2) ^ BULB_EXPONENT, i.e. I ~ V^0.6 once warm
+BULB_HOT_VOLTS = 1.0
+BULB_EXPONENT = 0.2
+
+# Newton iterations for the bulbs stop when the solution moves less than this (relative)
+NEWTON_TOL = 1e-10
+NEWTON_MAX_ITER = 50
+
+# Where the editor saves, loads and exports boards
+SAVE_PATH = "circuit.circ"
+EXPORT_PATH = "circuit.json"
+
+# Wire autorouting: A* stays inside the box spanned by the two ends grown by
+# ROUTE_MARGIN points and gives up (plain L path) after ROUTE_MAX_EXPANSIONS
+# points, so a drag costs at most that much per frame on any board.
+# Every change of direction costs ROUTE_BEND_COST extra steps.
+ROUTE_MARGIN = 8
+ROUTE_MAX_EXPANSIONS = 1000
+ROUTE_BEND_COST = 0.5
 
 # Component orientations (in grid units)
 ORIENTATIONS = [
@@ -65,6 +136,54 @@ def manhattan_path(p0, p1):
         path.append((x1, yy))
     return path
 
+ROUTE_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Grid path from p0 to p1 around points where blocked(p) is true (the two
+# ends themselves may be blocked). Falls back to manhattan_path when the
+# search window has no way through or the expansion budget runs out.
+def route_wire(p0, p1, blocked, margin=ROUTE_MARGIN, max_expansions=ROUTE_MAX_EXPANSIONS):
+    if p0 == p1:
+        return [p0]
+    x_lo, x_hi = min(p0[0], p1[0]) - margin, max(p0[0], p1[0]) + margin
+    y_lo, y_hi = min(p0[1], p1[1]) - margin, max(p0[1], p1[1]) + margin
+
+    def h(p):
+        return abs(p[0] - p1[0]) + abs(p[1] - p1[1])
+
+    # States are (point, direction index of the step that got there, -1 at p0)
+    start = (p0, -1)
+    best = {start: 0.0}
+    prev = {start: None}
+    heap = [(h(p0), 0, 0.0, start)]
+    tie = 0
+    expanded = 0
+    while heap and expanded < max_expansions:
+        _, _, g, state = heapq.heappop(heap)
+        if g > best[state]:
+            continue
+        p, d = state
+        if p == p1:
+            path = []
+            while state is not None:
+                path.append(state[0])
+                state = prev[state]
+            return path[::-1]
+        expanded += 1
+        for k, (dx, dy) in enumerate(ROUTE_STEPS):
+            q = (p[0] + dx, p[1] + dy)
+            if not (x_lo <= q[0] <= x_hi and y_lo <= q[1] <= y_hi):
+                continue
+            if q != p1 and blocked(q):
+                continue
+            cost = g + 1.0 + (ROUTE_BEND_COST if d not in (-1, k) else 0.0)
+            nxt = (q, k)
+            if cost < best.get(nxt, math.inf):
+                best[nxt] = cost
+                prev[nxt] = state
+                tie += 1
+                heapq.heappush(heap, (cost + h(q), tie, cost, nxt))
+    return manhattan_path(p0, p1)
+
 # Model
 class Resistor:
     def __init__(self, a, b, ohms, rid):
@@ -99,216 +218,2372 @@ class Switch:
         self.id = sid
         self.closed = True  # True = conducts, False = open circuit
 
-# DSU for node merging
+# Capacitors are open and inductors are shorts at DC; they matter in TransientSim
+class Capacitor:
+    def __init__(self, a, b, farads, cid):
+        self.a = a
+        self.b = b
+        self.farads = float(farads)
+        self.id = cid
+        self.voltage = 0.0  # v(a) - v(b), the transient state
+        self.current = 0.0  # a -> b through the capacitor
+
+class Inductor:
+    def __init__(self, a, b, henries, iid):
+        self.a = a
+        self.b = b
+        self.henries = float(henries)
+        self.id = iid
+        self.voltage = 0.0
+        self.current = 0.0  # a -> b, the transient state
+
+# Union-find over dense integer ids 0..n-1 (see NodeMap), array-backed with
+# union by rank and path halving
 class DSU:
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.rank = bytearray(n)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return
+        if self.rank[i] < self.rank[j]:
+            i, j = j, i
+        self.parent[j] = i
+        if self.rank[i] == self.rank[j]:
+            self.rank[i] += 1
+
+    # Union ia[k] with ib[k] for every k
+    def union_all(self, ia, ib):
+        union = self.union
+        for i, j in zip(np.asarray(ia).tolist(), np.asarray(ib).tolist()):
+            union(i, j)
+
+    # Root of every id as an array (fully compressed)
+    def roots(self):
+        root = np.array(self.parent, dtype=np.int64)
+        while True:
+            up = root[root]
+            if np.array_equal(up, root):
+                return root
+            root = up
+
+# Wire connectivity kept alive by the editor between solves.
+# Adding a wire merges two nets (the smaller one is relabelled); erasing one
+# only walks the net it belonged to and splits it if that edge was a bridge.
+# find() gives the representative point of a net, or the point itself when
+# no wire touches it. digest is the sum of the wires' hashes, so circuit_key
+# doesn't have to sort them.
+class WireNet:
+    def __init__(self, wires=()):
+        self.adj = {}      # point -> set of wired neighbours
+        self.root = {}     # point -> representative point
+        self.members = {}  # representative -> set of points in its net
+        self.digest = 0
+        for e in wires:
+            self.add(e)
+
+    def find(self, p):
+        return self.root.get(p, p)
+
+    # A copy that only answers find(), e.g. for a solve on another thread
+    def snapshot(self):
+        net = WireNet()
+        net.root = dict(self.root)
+        net.digest = self.digest
+        return net
+
+    def add(self, edge):
+        p, q = edge
+        if q in self.adj.get(p, ()):
+            return
+        self.digest += hash(tuple(sorted(edge)))
+        for a, b in ((p, q), (q, p)):
+            if a not in self.adj:
+                self.adj[a] = set()
+                self.root[a] = a
+                self.members[a] = {a}
+            self.adj[a].add(b)
+        rp, rq = self.root[p], self.root[q]
+        if rp == rq:
+            return
+        if len(self.members[rp]) < len(self.members[rq]):
+            rp, rq = rq, rp
+        moved = self.members.pop(rq)
+        for x in moved:
+            self.root[x] = rp
+        self.members[rp] |= moved
+
+    def remove(self, edge):
+        p, q = edge
+        if p not in self.adj or q not in self.adj[p]:
+            return
+        self.digest -= hash(tuple(sorted(edge)))
+        self.adj[p].discard(q)
+        self.adj[q].discard(p)
+        old = self.root[p]
+        net = self.members.pop(old)
+
+        # Walk what is left of the net from p; if q is not reached it split
+        seen = {p}
+        stack = [p]
+        while stack:
+            x = stack.pop()
+            for y in self.adj[x]:
+                if y not in seen:
+                    seen.add(y)
+                    stack.append(y)
+        parts = [seen] if q in seen else [seen, net - seen]
+        for part in parts:
+            rep = min(part)
+            for x in part:
+                self.root[x] = rep
+            self.members[rep] = part
+
+        # Points left without any wire are plain grid points again
+        for x in (p, q):
+            if not self.adj[x]:
+                del self.adj[x]
+                del self.root[x]
+                del self.members[x]
+
+# Hit-test priority when several parts share a grid point
+PART_KINDS = ("resistor", "battery", "lightbulb", "switch", "capacitor", "inductor")
+
+def part_terminals(comp):
+    if isinstance(comp, (Battery, ROW_CLASSES["battery"])):
+        return (comp.plus, comp.minus)
+    return (comp.a, comp.b)
+
+# Grid points a part sits on: its terminals and, for a straight part, the
+# points of its body between them
+def part_points(comp):
+    (x0, y0), (x1, y1) = part_terminals(comp)
+    if x0 != x1 and y0 != y1:
+        return [(x0, y0), (x1, y1)]
+    n = max(abs(x1 - x0), abs(y1 - y0))
+    if n == 0:
+        return [(x0, y0)]
+    return [(x0 + (x1 - x0) * k // n, y0 + (y1 - y0) * k // n) for k in range(n + 1)]
+
+# Grid point -> parts with a terminal there, so clicks and erases don't
+# have to scan every part list. covered counts the parts on every point (the
+# autorouter's obstacles). Parts are compared with ==, so the PartRow views
+# of a PartTable can be looked up and removed.
+class PartIndex:
     def __init__(self):
-        self.p = {}
-
-    def find(self, x):
-        if x not in self.p:
-            self.p[x] = x
-            return x
-        while self.p[x] != x:
-            self.p[x] = self.p[self.p[x]]
-            x = self.p[x]
+        self.at = {}  # point -> [(kind, part), ...]
+        self.covered = {}  # point -> number of parts on it
+
+    def add(self, kind, comp):
+        for p in part_terminals(comp):
+            self.at.setdefault(p, []).append((kind, comp))
+        for p in part_points(comp):
+            self.covered[p] = self.covered.get(p, 0) + 1
+
+    def remove(self, comp):
+        for p in part_terminals(comp):
+            hits = [h for h in self.at.get(p, ()) if h[1] != comp]
+            if hits:
+                self.at[p] = hits
+            else:
+                self.at.pop(p, None)
+        for p in part_points(comp):
+            if self.covered.get(p, 0) > 1:
+                self.covered[p] -= 1
+            else:
+                self.covered.pop(p, None)
+
+    def find(self, p):
+        hits = self.at.get(p)
+        if not hits:
+            return None
+        return min(hits, key=lambda h: PART_KINDS.index(h[0]))
+
+SINGULAR_MSG = (
+    "Can't solve circuit (singular).\n"
+    "Check for floating sections or\n"
+    "battery loops with no resistance."
+)
+
+# Raised with SINGULAR_MSG when a matrix can't be factored or solved
+class SingularError(ValueError):
+    pass
+
+NEWTON_MSG = (
+    "Lightbulbs did not settle.\n"
+    "The nonlinear solve failed\n"
+    "to converge."
+)
+
+# Sparsity pattern of COO triplets (duplicates are summed), worked out once so
+# that matrices with the same structure and new values are assembled without
+# sorting again, e.g. between Newton iterations. The first sparse
+# factorization's fill-reducing column order is kept too (col_order), so
+# later ones only redo the numeric LU.
+class MNAPattern:
+    def __init__(self, size, rows, cols):
+        self.size = size
+        self.col_order = None
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        self.sparse = sp is not None and size >= SPARSE_MIN_SIZE
+        # Column-major keys come out of np.unique already in CSC order
+        keys = cols * size + rows if self.sparse else rows * size + cols
+        keys, self.slot = np.unique(keys, return_inverse=True)
+        self.nnz = len(keys)
+        if self.sparse:
+            self.indices = (keys % size).astype(np.int32)
+            self.indptr = np.searchsorted(keys // size, np.arange(size + 1)).astype(np.int32)
+        else:
+            self.flat = keys
+
+    def matrix(self, vals):
+        data = np.bincount(self.slot, weights=np.asarray(vals, dtype=float), minlength=self.nnz)
+        if self.sparse:
+            return sp.csc_matrix((data, self.indices, self.indptr), shape=(self.size, self.size))
+        A = np.zeros((self.size * self.size,), dtype=float)
+        A[self.flat] = data
+        return A.reshape(self.size, self.size)
+
+    def factor(self, vals):
+        return MNAFactor(self.size, None, None, vals, self)
+
+# LU factorization of an MNA matrix given as COO triplets (or values for a known pattern).
+# Boards with many merged nodes go through scipy's sparse LU, small ones stay
+# dense (LAPACK LU, or an inverse without scipy) and are rejected as singular
+# by their condition number, since rounding rarely leaves an exact zero pivot.
+class MNAFactor:
+    def __init__(self, size, rows, cols, vals, pattern=None):
+        if pattern is None:
+            pattern = MNAPattern(size, rows, cols)
+        self.size = size
+        self.sparse = pattern.sparse
+        self.perm = None  # column order the sparse LU was given, when reused
+        A = pattern.matrix(vals)
+        if self.sparse:
+            try:
+                if pattern.col_order is None:
+                    self.lu = spla.splu(A)
+                    # perm_c[j] is where column j went
+                    pattern.col_order = np.argsort(self.lu.perm_c)
+                else:
+                    self.perm = pattern.col_order
+                    self.lu = spla.splu(A[:, self.perm], permc_spec="NATURAL")
+            except RuntimeError:
+                raise SingularError(SINGULAR_MSG) from None
+            return
+        anorm = np.abs(A).sum(axis=0).max(initial=0.0)
+        if sla is not None:
+            lu, piv, info = sla.lapack.dgetrf(A)
+            if info > 0:  # exactly zero pivot
+                raise SingularError(SINGULAR_MSG)
+            self.lu = (lu, piv)
+            rcond = sla.lapack.dgecon(lu, anorm, norm="1")[0]
+        else:
+            try:
+                self.inv = np.linalg.inv(A)
+            except np.linalg.LinAlgError:
+                raise SingularError(SINGULAR_MSG) from None
+            rcond = 1.0 / (anorm * np.abs(self.inv).sum(axis=0).max(initial=0.0))
+        if not rcond >= RCOND_MIN:
+            raise SingularError(SINGULAR_MSG)
+
+    def solve(self, z):
+        z = np.asarray(z, dtype=float)
+        if self.sparse:
+            x = self.lu.solve(z)
+            if self.perm is not None:
+                x[self.perm] = x.copy()
+        elif sla is not None:
+            x = sla.lu_solve(self.lu, z, check_finite=False)
+        else:
+            x = self.inv @ z
+        if not np.all(np.isfinite(x)):
+            raise SingularError(SINGULAR_MSG)
         return x
 
-    def union(self, a, b):
-        ra, rb = self.find(a), self.find(b)
-        if ra != rb:
-            self.p[rb] = ra
+    # Solve A^T x = z with the same factorization (adjoint systems)
+    def solve_transpose(self, z):
+        z = np.asarray(z, dtype=float)
+        if self.sparse:
+            x = self.lu.solve(z if self.perm is None else z[self.perm], trans="T")
+        elif sla is not None:
+            x = sla.lu_solve(self.lu, z, trans=1, check_finite=False)
+        else:
+            x = self.inv.T @ z
+        if not np.all(np.isfinite(x)):
+            raise SingularError(SINGULAR_MSG)
+        return x
 
-def solve_dc(wires, resistors, batteries, lightbulbs, switches):
+# Filament resistance at voltage dv (works on arrays)
+def hot_ohms(ohms, dv):
+    return ohms * (1.0 + (dv / BULB_HOT_VOLTS) ** 2) ** BULB_EXPONENT
+
+# Newton companion of a bulb at voltage dv: i(v) ~ g * v + i_eq
+def bulb_companion(ohms, dv):
+    u = (dv / BULB_HOT_VOLTS) ** 2
+    r = ohms * (1.0 + u) ** BULB_EXPONENT
+    g = (1.0 - 2.0 * BULB_EXPONENT * u / (1.0 + u)) / r
+    return g, dv / r - g * dv
+
+# Where stamp_components put the lightbulbs: matrix index of each terminal
+# (-1 for ground) and the COO value slots holding each bulb's conductance.
+class BulbStamps:
+    def __init__(self, ohms, ia, ib, pos, sign, owner):
+        self.ohms = np.asarray(ohms, dtype=float)
+        self.ia = np.asarray(ia, dtype=np.int64)
+        self.ib = np.asarray(ib, dtype=np.int64)
+        self.pos = np.asarray(pos, dtype=np.int64)
+        self.sign = np.asarray(sign, dtype=float)
+        self.owner = np.asarray(owner, dtype=np.int64)
+
+    def voltages(self, x):
+        x = np.append(x, 0.0)
+        return x[self.ia] - x[self.ib]
+
+    # z plus current i flowing through every bulb from a to b
+    def inject(self, z, i):
+        inj = np.zeros((len(z) + 1,), dtype=float)
+        np.add.at(inj, self.ia, -i)
+        np.add.at(inj, self.ib, i)
+        return z + inj[:-1]
+
+    # Re-stamp every bulb linearized at solution x; returns the new right-hand side
+    def linearize(self, x, vals, z):
+        g, i_eq = bulb_companion(self.ohms, self.voltages(x))
+        vals[self.pos] = self.sign * g[self.owner]
+        return self.inject(z, i_eq)
+
+# Solve an MNA system with nonlinear lightbulbs by Newton-Raphson. vals holds
+# the bulbs at their cold conductance (as stamp_components leaves them) and x
+# is the operating point to start from (default: the cold solution). Every
+# iteration only refills the values of the fixed pattern and refactors.
+def newton_solve(pattern, vals, z, bulbs, x=None):
+    return newton_factor(pattern, vals, z, bulbs, x)[0]
+
+# newton_solve that also returns the last MNAFactor, the Jacobian at the
+# solution (to within the Newton tolerance)
+def newton_factor(pattern, vals, z, bulbs, x=None):
+    vals = np.array(vals, dtype=float)
+    if x is None or not len(bulbs.ohms):
+        factor = pattern.factor(vals)
+        x = factor.solve(z)
+        if not len(bulbs.ohms):
+            return x, factor
+    for _ in range(NEWTON_MAX_ITER):
+        zk = bulbs.linearize(x, vals, z)
+        factor = pattern.factor(vals)
+        x_new = factor.solve(zk)
+        step = np.max(np.abs(x_new - x))
+        x = x_new
+        if step <= NEWTON_TOL * (1.0 + np.max(np.abs(x))):
+            return x, factor
+    raise ValueError(NEWTON_MSG)
+
+# A part attribute over a part list or PartTable: point tuples for the
+# terminals, a float array for the values
+def part_column(items, attr):
+    if isinstance(items, PartTable):
+        return items.get(attr)
+    if attr in ("a", "b", "plus", "minus"):
+        return [getattr(c, attr) for c in items]
+    return np.array([getattr(c, attr) for c in items], dtype=float)
+
+# Write one value per part into an attribute: straight into the column of a
+# PartTable, onto every object of a part list
+def set_part_column(items, attr, values):
+    if isinstance(items, PartTable):
+        col = ROW_COLUMNS[items.kind][attr]
+        items.rec[col][:items.n] = values
+        if col in DIGEST_COLUMNS:
+            items.rehash()
+        return
+    for c, v in zip(items, np.asarray(values).tolist()):
+        setattr(c, attr, v)
+
+def part_ids(items):
+    if isinstance(items, PartTable):
+        return items.get("id").tolist()
+    return [c.id for c in items]
+
+# Voltage at every point of a terminal list (0 off the circuit)
+def terminal_voltages(point_voltage, points):
+    return np.array([point_voltage.get(p, 0.0) for p in points], dtype=float)
+
+# COO stamps of conductances g between node index arrays ia, ib (-1 = ground).
+# Returns the (position in vals, sign, part) of every stamp written.
+def stamp_conductances(ia, ib, g, rows, cols, vals):
+    k = len(g)
+    r = np.concatenate([ia, ib, ia, ib])
+    c = np.concatenate([ia, ib, ib, ia])
+    sign = np.repeat([1.0, 1.0, -1.0, -1.0], k)
+    keep = np.nonzero((r >= 0) & (c >= 0))[0]
+    pos = np.arange(len(vals), len(vals) + len(keep), dtype=np.int64)
+    rows.extend(r[keep].tolist())
+    cols.extend(c[keep].tolist())
+    vals.extend((sign * np.tile(g, 4))[keep].tolist())
+    return pos, sign[keep], np.tile(np.arange(k, dtype=np.int64), 4)[keep]
+
+# Stamp resistors, lightbulbs (cold) and batteries into COO triplets.
+# nodes is the numbered NodeMap of the circuit these parts belong to; battery
+# rows start at n. Parts may be lists or PartTables; every kind is stamped as
+# a whole with array ops on the terminal node indices.
+# Returns the BulbStamps for re-stamping the bulbs at an operating point.
+def stamp_components(nodes, n, resistors, batteries, lightbulbs, rows, cols, vals, z):
+    # Resistors shorted by wires carry no stamps
+    ia, ib = nodes.terminals("resistor")
+    live = ia != ib
+    stamp_conductances(ia[live], ib[live], 1.0 / part_column(resistors, "ohms")[live], rows, cols, vals)
+
+    # Lightbulbs at their cold resistance; a shorted one sees no voltage
+    la, lb = nodes.terminals("lightbulb")
+    shorted = la == lb
+    la[shorted] = -1
+    lb[shorted] = -1
+    bulb_ohms = part_column(lightbulbs, "ohms")
+    pos, sign, owner = stamp_conductances(la, lb, 1.0 / bulb_ohms, rows, cols, vals)
+
+    # Battery current rows: +1 at the plus node, -1 at the minus node
+    brow = n + np.arange(len(batteries), dtype=np.int64)
+    for i, s in zip(nodes.terminals("battery"), (1.0, -1.0)):
+        live = i >= 0
+        rows.extend(np.concatenate([i[live], brow[live]]).tolist())
+        cols.extend(np.concatenate([brow[live], i[live]]).tolist())
+        vals.extend([s] * (2 * int(live.sum())))
+    z[brow] += part_column(batteries, "volts")
+
+    return BulbStamps(bulb_ohms, la, lb, pos, sign, owner)
+
+# Current, power, brightness and fire flag of bulbs carrying current i at
+# voltage dv (arrays, one entry per bulb)
+def bulb_states(i, dv):
+    current = np.abs(i)
+    power = np.abs(i * dv)
+    # Brightness: normalize to ~5W max for full brightness
+    brightness = np.minimum(1.0, power / 5.0)
+
+    # Fire detection: realistic bulb failure
+    # Typical incandescent bulbs rated for ~60W at ~120V (household)
+    # Small bulbs (like our 9V circuits) might be rated for 1-3W
+    # If power exceeds 10W or current exceeds 0.5A, bulb catches fire
+    MAX_SAFE_POWER = 10.0  # Watts
+    MAX_SAFE_CURRENT = 0.5  # Amps
+
+    on_fire = (power > MAX_SAFE_POWER) | (current > MAX_SAFE_CURRENT)
+    return current, power, brightness, on_fire
+
+def set_bulb_states(lightbulbs, i, dv):
+    for attr, values in zip(("current", "power", "brightness", "on_fire"), bulb_states(i, dv)):
+        set_part_column(lightbulbs, attr, values)
+
+# Which of the edges (a ids, b ids) picked by mask join two of n ids that the
+# picked edges before them have not joined yet: a spanning forest of them
+def spanning_edges(ia, ib, n, mask):
+    keep = np.zeros((len(mask),), dtype=bool)
+    forest = DSU(n)
+    ia, ib = np.asarray(ia).tolist(), np.asarray(ib).tolist()
+    for k in np.nonzero(mask)[0].tolist():
+        i, j = forest.find(ia[k]), forest.find(ib[k])
+        if i != j:
+            forest.union(i, j)
+            keep[k] = True
+    return keep
+
+# Spanning forest of the graph of edges (a ids, b ids) over ids 0..n-1, laid
+# out once so that flows() costs a cumulative sum. Each tree edge carries
+# the current its subtree pushes into the parts (leaving), from edge a to
+# edge b; edges closing a loop carry 0 (any split is valid). Every subtree
+# is a contiguous run of self.order, and label is the root of each id's tree.
+class WireForest:
+    def __init__(self, n, ia, ib):
+        ea, eb = np.asarray(ia, dtype=np.int64).tolist(), np.asarray(ib, dtype=np.int64).tolist()
+        adj = {}
+        for k, (p, q) in enumerate(zip(ea, eb)):
+            if p != q:
+                adj.setdefault(p, []).append((q, k))
+                adj.setdefault(q, []).append((p, k))
+
+        parent = {}  # id -> (parent id, edge index)
+        order = []
+        for start in adj:
+            if start in parent:
+                continue
+            parent[start] = (-1, -1)
+            stack = [start]
+            while stack:
+                p = stack.pop()
+                order.append(p)
+                for q, k in adj[p]:
+                    if q not in parent:
+                        parent[q] = (p, k)
+                        stack.append(q)
+
+        # Parents come before their children in order: subtree sizes bottom
+        # up, then each subtree gets its run [lo, lo + size) top down
+        size = dict.fromkeys(order, 1)
+        for p in reversed(order):
+            up = parent[p][0]
+            if up >= 0:
+                size[up] += size[p]
+        label = list(range(n))
+        lo = {}
+        free = {}  # next slot for a child of p
+        end = 0
+        for p in order:
+            up = parent[p][0]
+            if up < 0:
+                lo[p] = end
+                end += size[p]
+            else:
+                label[p] = label[up]
+                lo[p] = free[up]
+                free[up] += size[p]
+            free[p] = lo[p] + 1
+        self.label = np.array(label, dtype=np.int64)
+        self.order = np.zeros((len(order),), dtype=np.int64)
+        self.order[list(lo.values())] = list(lo.keys())
+
+        self.edges = len(ea)
+        tree, start, stop, sign = [], [], [], []
+        for p in order:
+            k = parent[p][1]
+            if k >= 0:
+                tree.append(k)
+                start.append(lo[p])
+                stop.append(lo[p] + size[p])
+                sign.append(1.0 if p == eb[k] else -1.0)
+        self.tree = np.array(tree, dtype=np.int64)
+        self.start = np.array(start, dtype=np.int64)
+        self.stop = np.array(stop, dtype=np.int64)
+        self.sign = np.array(sign, dtype=float)
+
+    # Current through every edge given what each id pushes into its parts
+    def flows(self, leaving):
+        total = np.concatenate([[0.0], np.cumsum(leaving[self.order])])
+        i = np.zeros((self.edges,), dtype=float)
+        i[self.tree] = self.sign * (total[self.stop] - total[self.start])
+        return i
+
+# Turns MNA solution vectors of one numbered NodeMap into the results of
+# solve_dc. Everything that depends only on the topology (the point of every
+# node, terminal ids, part ids and ohms, the WireForest of the wires and
+# inductors) is gathered once; results() only computes values.
+# Wire currents are split the same way by every solver: the closed switches
+# in spanning_edges() of the wire forest's trees carry the current between
+# them, the others none.
+class ResultMap:
+    def __init__(self, nodes, grounds, ground_pt, wires, resistors, batteries, lightbulbs, switches, inductors=(),
+                 blocks=()):
+        points = nodes.points
+        self.points = points
+        self.n = nodes.n
+        self.node = nodes.node
+        self.ground_pt = ground_pt
+        self.node_points = [points[g] for g in grounds] + [points[r] for r in nodes.node_roots.tolist()]
+        self.grounded = np.zeros((len(grounds),), dtype=float)
+
+        self.resistors = resistors
+        self.lightbulbs = lightbulbs
+        self.switches = switches
+        self.ends = [nodes.ends[kind] for kind in ("resistor", "lightbulb", "battery")]
+        self.resistor_ohms = part_column(resistors, "ohms")
+        self.bulb_ohms = part_column(lightbulbs, "ohms")
+        self.ids = [part_ids(items) for items in (resistors, batteries, lightbulbs)]
+        self.blocks = [(blk, nodes.ids(blk.points)) for blk in blocks]
+
+        self.wires = [tuple(e) for e in wires]
+        ia, ib = nodes.ends["inductor"]
+        self.forest = WireForest(len(points), np.concatenate([nodes.ids([p for p, _ in self.wires]), ia]),
+                                 np.concatenate([nodes.ids([q for _, q in self.wires]), ib]))
+        sa, sb = nodes.ends["switch"]
+        self.switch_ends = (sa, sb, self.forest.label[sa], self.forest.label[sb])
+
+    # (a ids, b ids, currents) of the switches that carry current, worked
+    # out from the current every point pushes into the other parts
+    def switch_flows(self, leaving):
+        sa, sb, ta, tb = self.switch_ends
+        on = spanning_edges(ta, tb, len(self.points), part_column(self.switches, "closed") != 0)
+        trees = WireForest(len(self.points), ta[on], tb[on])
+        return sa[on], sb[on], trees.flows(np.bincount(self.forest.label, leaving, minlength=len(self.points)))
+
+    # flows, when given, are switch_flows() already known, e.g. from the
+    # switch rows of an IncrementalSolver
+    def results(self, x, flows=None):
+        n = self.n
+        node_voltage = dict(zip(self.node_points, np.concatenate([self.grounded, x[:n]]).tolist()))
+
+        # Voltages by point id, then each part kind at once over its terminal ids
+        v = np.append(x[:n], 0.0)[self.node]
+        point_voltage = dict(zip(self.points, v.tolist()))
+
+        (ra, rb), (la, lb), (ba, bm) = self.ends
+        dv = v[ra] - v[rb]
+        ri = dv / self.resistor_ohms
+        set_part_column(self.resistors, "power", np.abs(ri * dv))
+
+        dv = v[la] - v[lb]
+        li = dv / hot_ohms(self.bulb_ohms, dv)
+        set_bulb_states(self.lightbulbs, li, dv)
+
+        bi = np.asarray(x[n:n + len(ba)], dtype=float)
+        r_ids, b_ids, l_ids = self.ids
+        resistor_current = dict(zip(r_ids, ri.tolist()))
+        battery_current = dict(zip(b_ids, bi.tolist()))
+        lightbulb_current = dict(zip(l_ids, li.tolist()))
+
+        # Current each grid point pushes into component terminals, then
+        # into the switches
+        leaving = np.bincount(np.concatenate([ra, la, ba, rb, lb, bm]),
+                              weights=np.concatenate([ri, li, bi, -ri, -li, -bi]), minlength=len(self.points))
+        for blk, pts in self.blocks:
+            np.add.at(leaving, pts, blk.port_currents(point_voltage))
+        fa, fb, fi = flows if flows is not None else self.switch_flows(leaving)
+        np.add.at(leaving, fa, fi)
+        np.add.at(leaving, fb, -fi)
+
+        i = self.forest.flows(leaving)[:len(self.wires)]
+        wire_currents = dict(zip(self.wires, i.tolist()))
+        return (node_voltage, point_voltage, resistor_current, battery_current, lightbulb_current, wire_currents,
+                self.ground_pt)
+
+# Turn an MNA solution vector into the dicts returned by solve_dc
+def dc_results(x, nodes, grounds, ground_pt, wires, resistors, batteries, lightbulbs, switches, inductors=(),
+               blocks=()):
+    return ResultMap(nodes, grounds, ground_pt, wires, resistors, batteries, lightbulbs, switches, inductors,
+                     blocks).results(x)
+
+# Connectivity layer shared by every solver. Each grid point of the circuit
+# gets a dense integer id (its position in the sorted self.points) and the
+# terminals of every part kind are looked up once into id arrays,
+# ends[kind] = (a ids, b ids) with kinds as in PART_KINDS. Merging unions ids
+# in a DSU; number() then gives every point its node index (-1 for ground)
+# and terminals() hands the node-index arrays to stamping and results.
+class NodeMap:
+    def __init__(self, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), extra=()):
+        self.wires = [tuple(e) for e in wires]
+        ends = {}
+        for kind, items, (_, a, b, _) in zip(PART_KINDS, (resistors, batteries, lightbulbs, switches, capacitors,
+                                                          inductors), CIRCUIT_TABLES):
+            ends[kind] = (part_column(items, a), part_column(items, b))
+        pts = {p for e in self.wires for p in e}
+        for pa, pb in ends.values():
+            pts.update(pa)
+            pts.update(pb)
+        pts.update(extra)
+        self.points = sorted(pts)
+        self.id = {p: k for k, p in enumerate(self.points)}
+        self.ends = {kind: (self.ids(pa), self.ids(pb)) for kind, (pa, pb) in ends.items()}
+        # Batteries by id: ground_islands grounds every island at its first
+        # one, so erasing or reordering batteries doesn't move the others' ground
+        self.ground_order = np.argsort(np.asarray(part_ids(batteries), dtype=np.int64), kind="stable")
+        self.dsu = DSU(len(self.points))
+        self.root = None
+        self.node = None
+        self.node_roots = None
+        self.n = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    # Ids of grid points (-1 for points off the circuit)
+    def ids(self, points):
+        get = self.id.get
+        return np.fromiter((get(p, -1) for p in points), dtype=np.int64, count=len(points))
+
+    # Wires join nodes. nets, when given, must be a WireNet built from exactly
+    # these wires: its nets become the starting sets instead.
+    def merge_wires(self, nets=None):
+        if nets is None:
+            self.dsu.union_all(self.ids([p for p, _ in self.wires]), self.ids([q for _, q in self.wires]))
+            return
+        parent = [self.id[nets.find(p)] for p in self.points]
+        for k in set(parent):
+            self.dsu.rank[k] = 1
+        self.dsu.parent = parent
+
+    # Parts of a kind that act as shorts (mask picks some of them)
+    def merge(self, kind, mask=None):
+        ia, ib = self.ends[kind]
+        if mask is not None:
+            ia, ib = ia[mask], ib[mask]
+        self.dsu.union_all(ia, ib)
+
+    # Node root id of every point; call once merging is done
+    def roots(self):
+        if self.root is None:
+            self.root = self.dsu.roots()
+        return self.root
+
+    # Number the nodes: the roots in `first` get 0, 1, ... in that order, the
+    # others follow in id order, and every root in `grounds` gets -1
+    def number(self, grounds=(), first=()):
+        root = self.roots()
+        index = np.full((len(self.points),), -1, dtype=np.int64)
+        first = list(first)
+        rest = np.setdiff1d(np.unique(root), np.concatenate([np.asarray(first, dtype=np.int64),
+                                                            np.asarray(list(grounds), dtype=np.int64)]))
+        self.node_roots = np.concatenate([np.asarray(first, dtype=np.int64), rest])
+        index[self.node_roots] = np.arange(len(self.node_roots), dtype=np.int64)
+        self.node = index[root]
+        self.n = len(self.node_roots)
+        return self.n
+
+    # Node index of every point of a list; ground -> `ground`, off the circuit -> `missing`
+    def point_nodes(self, points, ground=-1, missing=-1):
+        i = self.ids(points)
+        node = np.where(i >= 0, self.node[i], missing)
+        node[(i >= 0) & (node < 0)] = ground
+        return node
+
+    # Node index arrays of a kind's terminals (ground -> `ground`)
+    def terminals(self, kind, ground=-1):
+        ia, ib = self.ends[kind]
+        na, nb = self.node[ia], self.node[ib]
+        if ground != -1:
+            na = np.where(na < 0, ground, na)
+            nb = np.where(nb < 0, ground, nb)
+        return na, nb
+
+# Adds the seconds since the previous mark to timings[phase]; does nothing
+# when timings is None
+class PhaseTimer:
+    def __init__(self, timings):
+        self.timings = timings
+        self.t = time.perf_counter()
+
+    def mark(self, phase):
+        if self.timings is not None:
+            t = time.perf_counter()
+            self.timings[phase] = self.timings.get(phase, 0.0) + t - self.t
+            self.t = t
+
+# Raised for circuits that can't be solved, with the grid points to blame
+class CircuitError(ValueError):
+    def __init__(self, message, points=()):
+        super().__init__(message)
+        self.points = sorted(points)
+
+def point_list(points, limit=4):
+    points = sorted(points)
+    text = ", ".join(f"({x},{y})" for x, y in points[:limit])
+    if len(points) > limit:
+        text += f" +{len(points) - limit} more"
+    return text
+
+# The point every voltage is measured against: the minus terminal of the
+# battery with the lowest id
+def ground_point(batteries):
+    return batteries[int(np.argmin(part_ids(batteries)))].minus
+
+# Batteries on the path between nodes a and b of a battery forest (adj: node -> [(node, battery index)])
+def battery_path(adj, a, b):
+    prev = {a: None}
+    queue = [a]
+    for p in queue:
+        if p == b:
+            break
+        for q, bat in adj.get(p, ()):
+            if q not in prev:
+                prev[q] = (p, bat)
+                queue.append(q)
+    path = []
+    while prev[b] is not None:
+        b, bat = prev[b]
+        path.append(bat)
+    return path
+
+# Pre-pass over the merged node graph of a NodeMap, before anything is
+# factored. Resistors, bulbs, batteries and links (extra conducting pairs as
+# (a ids, b ids) arrays, e.g. capacitors in a transient or subcircuit blocks)
+# join nodes into islands. Raises CircuitError for a loop made of batteries
+# alone and for islands without a battery (floating, their voltages are
+# undefined). Returns the ground of every island as a root id: the node of
+# the minus terminal of its battery with the lowest id, in id order (so the
+# island of ground_point() comes first).
+def ground_islands(nodes, links=()):
+    root = nodes.roots()
+    points = nodes.points
+    plus, minus = nodes.ends["battery"]
+    sources = DSU(len(points))
+    adj = {}
+    for k, (p, m) in enumerate(zip(root[plus].tolist(), root[minus].tolist())):
+        if sources.find(p) == sources.find(m):
+            loop = battery_path(adj, p, m) + [k]
+            bad = {points[t[j]] for j in loop for t in (plus, minus)}
+            raise CircuitError("Battery loop with no resistance\nat " + point_list(bad), bad)
+        sources.union(p, m)
+        adj.setdefault(p, []).append((m, k))
+        adj.setdefault(m, []).append((p, k))
+
+    islands = DSU(len(points))
+    for ia, ib in [nodes.ends[kind] for kind in ("resistor", "lightbulb", "battery")] + list(links):
+        islands.union_all(root[ia], root[ib])
+    island = islands.roots()
+
+    grounds = {}
+    for m in root[minus[nodes.ground_order]].tolist():
+        grounds.setdefault(int(island[m]), m)
+    floating = np.nonzero(~np.isin(island[root], list(grounds)))[0]
+    if len(floating):
+        bad = [points[k] for k in floating.tolist()]
+        raise CircuitError("Floating section (no battery)\nat " + point_list(bad), bad)
+    return list(grounds.values())
+
+# A reusable block of wires, resistors and batteries, defined once in its own
+# grid coordinates and seen from outside only through its ports (grid points).
+# The inside is reduced right away to a Norton port model: the currents
+# flowing into the ports are I = Y v + J (Schur complement of the internal
+# nodes), so every Block placed from it adds a small dense port block instead
+# of its whole network. Internal voltages are recovered on demand.
+# Bulbs and switches would make the model change with every solve, so they
+# stay at the top level. Don't modify the parts after construction.
+# Blocks are taken by solve_dc, dc_sensitivity, IncrementalSolver and
+# SolveCache only; the sweeps, TransientSim, the file format and the editor
+# don't know about them.
+class Subcircuit:
+    def __init__(self, ports, wires=(), resistors=(), batteries=()):
+        self.ports = [tuple(p) for p in ports]
+        self.wires = set(wires)
+        self.resistors = list(resistors)
+        self.batteries = list(batteries)
+
+        nodes = NodeMap(self.wires, self.resistors, self.batteries, (), (), extra=self.ports)
+        nodes.merge_wires()
+        root = nodes.roots()
+        port_roots = root[nodes.ids(self.ports)].tolist()
+        if len(set(port_roots)) < len(port_roots):
+            seen = {}
+            for p, r in zip(self.ports, port_roots):
+                if r in seen:
+                    bad = [seen[r], p]
+                    raise CircuitError("Subcircuit ports wired together\nat " + point_list(bad), bad)
+                seen[r] = p
+
+        # Ports first, then internal nodes and battery rows
+        k = len(port_roots)
+        n = nodes.number(first=port_roots)
+        size = n + len(self.batteries)
+        rows, cols, vals = [], [], []
+        z = np.zeros(size)
+        stamp_components(nodes, n, self.resistors, self.batteries, (), rows, cols, vals, z)
+        a = np.zeros((size, size))
+        np.add.at(a, (rows, cols), vals)
+
+        # x_inner = x0 - X v
+        try:
+            sol = np.linalg.solve(a[k:, k:], np.column_stack([a[k:, :k], z[k:]]))
+        except np.linalg.LinAlgError:
+            bad = [p for p in nodes.points if p not in self.ports] or self.ports
+            raise CircuitError("Subcircuit with a floating part or a\nbattery across its ports at "
+                               + point_list(bad), bad) from None
+        self.X = sol[:, :k]
+        self.x0 = sol[:, k]
+        self.Y = a[:k, :k] - a[:k, k:] @ self.X
+        self.J = a[:k, k:] @ self.x0 - z[:k]
+        self.point_port = {p: i for p, i in zip(nodes.points, nodes.node.tolist()) if i < k}
+        self.point_row = {p: i - k for p, i in zip(nodes.points, nodes.node.tolist()) if i >= k}
+
+    # Port pairs the inside conducts between (for the island check)
+    def links(self):
+        k = len(self.ports)
+        return [(i, j) for i in range(k) for j in range(i + 1, k) if self.Y[i, j] != 0.0]
+
+# One placement of a Subcircuit: its k-th port sits on grid point points[k]
+class Block:
+    def __init__(self, subcircuit, points, bid):
+        if len(points) != len(subcircuit.ports):
+            raise ValueError(f"Block needs {len(subcircuit.ports)} port points, got {len(points)}")
+        self.subcircuit = subcircuit
+        self.points = [tuple(p) for p in points]
+        self.id = bid
+
+    # Currents flowing into the block at each port, from solve_dc's point_voltage
+    def port_currents(self, point_voltage):
+        v = np.array([point_voltage[p] for p in self.points])
+        return self.subcircuit.Y @ v + self.subcircuit.J
+
+    # Voltage of every grid point of the definition (its own coordinates)
+    def inner_voltages(self, point_voltage):
+        sub = self.subcircuit
+        v = np.array([point_voltage[p] for p in self.points])
+        x = sub.x0 - sub.X @ v
+        out = {p: float(v[i]) for p, i in sub.point_port.items()}
+        for p, row in sub.point_row.items():
+            out[p] = float(x[row])
+        return out
+
+# Port pairs every block conducts between, as (a ids, b ids) links for ground_islands
+def block_links(nodes, blocks):
+    links = []
+    for blk in blocks:
+        ids = nodes.ids(blk.points)
+        pairs = np.array(blk.subcircuit.links(), dtype=np.int64).reshape(-1, 2)
+        links.append((ids[pairs[:, 0]], ids[pairs[:, 1]]))
+    return links
+
+# Stamp every block's port model into COO triplets (nodes as in stamp_components)
+def stamp_blocks(nodes, blocks, rows, cols, vals, z):
+    for blk in blocks:
+        sub = blk.subcircuit
+        ti = nodes.point_nodes(blk.points)
+        live = np.nonzero(ti >= 0)[0]
+        r, c = np.meshgrid(ti[live], ti[live], indexing="ij")
+        rows.extend(r.ravel().tolist())
+        cols.extend(c.ravel().tolist())
+        vals.extend(sub.Y[np.ix_(live, live)].ravel().tolist())
+        np.subtract.at(z, ti[live], sub.J[live])
+
+# Merge, island check, numbering and stamping of a DC solve. Returns the
+# NodeMap, the island grounds and the COO system (rows, cols, vals, z) with
+# its BulbStamps. timer, when given, gets the merge and stamp marks.
+def dc_system(wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), nets=None, blocks=(),
+              timer=None):
     if len(batteries) == 0:
         raise ValueError("Add at least one battery.")
 
-    pts = set()
-    for e in wires:
-        pts.add(e[0]); pts.add(e[1])
-    for r in resistors:
-        pts.add(r.a); pts.add(r.b)
-    for b in batteries:
-        pts.add(b.plus); pts.add(b.minus)
-    for lb in lightbulbs:
-        pts.add(lb.a); pts.add(lb.b)
-    for sw in switches:
-        pts.add(sw.a); pts.add(sw.b)
-
-    if not pts:
+    timer = timer or PhaseTimer(None)
+    nodes = NodeMap(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors,
+                    extra=[p for blk in blocks for p in blk.points])
+    if not len(nodes):
         raise ValueError("Nothing to solve.")
 
-    dsu = DSU()
-    for p in pts:
-        dsu.find(p)
-    for (p, q) in wires:
-        dsu.union(p, q)
-    
-    # Closed switches act like wires
-    for sw in switches:
-        if sw.closed:
-            dsu.union(sw.a, sw.b)
-
-    ground_pt = batteries[0].minus
-    ground = dsu.find(ground_pt)
-
-    roots = {}
-    for p in pts:
-        rp = dsu.find(p)
-        roots[rp] = True
-    roots = list(roots.keys())
+    # Closed switches act like wires, inductors are shorts at DC (capacitors
+    # are simply left open)
+    nodes.merge_wires(nets)
+    nodes.merge("switch", part_column(switches, "closed") != 0)
+    nodes.merge("inductor")
+    grounds = ground_islands(nodes, block_links(nodes, blocks))
+    timer.mark("merge")
 
-    node_roots = [r for r in roots if r != ground]
-    node_roots.sort(key=lambda t: (t[0], t[1]))
-    n = len(node_roots)
+    # Every island is referenced to its own ground; they share one
+    # block-diagonal system
+    n = nodes.number(grounds)
+    size = n + len(batteries)
 
-    idx = {root: i for i, root in enumerate(node_roots)}
-
-    m = len(batteries)
-    size = n + m
-    if size == 0:
-        return {ground: 0.0}, {ground_pt: 0.0}, {}, {}, {}, {}, ground_pt
-
-    A = np.zeros((size, size), dtype=float)
+    rows, cols, vals = [], [], []
     z = np.zeros((size,), dtype=float)
-
-    def vi(root):
-        if root == ground:
+    bulbs = stamp_components(nodes, n, resistors, batteries, lightbulbs, rows, cols, vals, z)
+    stamp_blocks(nodes, blocks, rows, cols, vals, z)
+    timer.mark("stamp")
+    return nodes, grounds, rows, cols, vals, z, bulbs
+
+# timings, when given, collects seconds spent in the merge, stamp, solve and
+# post phases (see circuitsim_bench.py). blocks are placed Subcircuits.
+def solve_dc(wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), nets=None,
+             timings=None, blocks=()):
+    timer = PhaseTimer(timings)
+    nodes, grounds, rows, cols, vals, z, bulbs = dc_system(wires, resistors, batteries, lightbulbs, switches,
+                                                           capacitors, inductors, nets, blocks, timer)
+
+    x = newton_solve(MNAPattern(len(z), rows, cols), vals, z, bulbs)
+    timer.mark("solve")
+
+    results = dc_results(x, nodes, grounds, ground_point(batteries), wires, resistors, batteries, lightbulbs, switches,
+                         inductors, blocks)
+    timer.mark("post")
+    return results
+
+# Adjoint sensitivities of the voltage at grid point `probe` (against its
+# island's ground): with J^T lam = e_probe solved on the factorization of the
+# final DC solve (the Newton Jacobian when there are bulbs), every part's
+# derivative is a product of terminal values, for all parts at once.
+#   resistor / bulb (cold ohms):  dV/dR = (lam_a - lam_b) * i / R
+#   battery:                      dV/dvolts = lam of its current row
+# Returns (resistor, lightbulb, battery) dicts id -> derivative, in V/ohm and
+# V/V; a probe on ground gets all zeros.
+def dc_sensitivity(wires, resistors, batteries, lightbulbs, switches, probe, capacitors=(), inductors=(), blocks=()):
+    nodes, _, rows, cols, vals, z, bulbs = dc_system(wires, resistors, batteries, lightbulbs, switches,
+                                                           capacitors, inductors, blocks=blocks)
+    i = nodes.point_nodes([tuple(probe)], missing=-2)[0]
+    if i == -2:
+        raise ValueError(f"Probe {tuple(probe)} is not on the circuit")
+    x, factor = newton_factor(MNAPattern(len(z), rows, cols), vals, z, bulbs)
+
+    e = np.zeros((len(z),), dtype=float)
+    if i >= 0:
+        e[i] = 1.0
+    lam = factor.solve_transpose(e)
+    n = nodes.n
+    v = np.append(x[:n], 0.0)
+    adj = np.append(lam[:n], 0.0)
+
+    ra, rb = nodes.terminals("resistor")
+    ohms = part_column(resistors, "ohms")
+    dr = (adj[ra] - adj[rb]) * (v[ra] - v[rb]) / (ohms * ohms)
+
+    la, lb = bulbs.ia, bulbs.ib
+    dv = v[la] - v[lb]
+    dl = (adj[la] - adj[lb]) * (dv / hot_ohms(bulbs.ohms, dv)) / bulbs.ohms
+
+    db = lam[n:n + len(batteries)]
+    return (dict(zip(part_ids(resistors), dr.tolist())), dict(zip(part_ids(lightbulbs), dl.tolist())),
+            dict(zip(part_ids(batteries), db.tolist())))
+
+# Toggle at most this many switches against a factorization before refactoring it
+MAX_SWITCH_UPDATES = 16
+# Boards with more lightbulbs refactor on every Newton iteration instead
+MAX_BULB_UPDATES = 32
+
+# Keeps the MNA system of a circuit factored between solves so that toggling a
+# switch only costs a low-rank (Woodbury) update instead of a full solve_dc.
+# Each switch gets its own MNA row: closed it is a 0 V source between its
+# terminals, open it pins its own current to zero. Flipping one switch changes
+# the matrix by U C U^T with U = [w, e_row] (w = terminal incidence), so only
+# A0^-1 U has to be back-substituted, once per switch.
+# With lightbulbs the system is nonlinear: every solve is a Newton iteration
+# warm-started from the previous solution. A bulb's conductance moving away
+# from the cold value in the factored matrix is a rank-one change w g w^T
+# too, so the bulbs' columns join the switches' in the update and an
+# iteration is a small dense solve. Past MAX_BULB_UPDATES bulbs every
+# iteration refactors on the fixed sparsity pattern instead.
+# Closed switches that close a loop (in parallel with other closed switches,
+# maybe through wires) would make the matrix singular, so only the switches
+# of a spanning forest over the closed ones conduct in the matrix; the others
+# are stamped open, which changes nothing since their ends are already
+# joined. Islands are grounded as if every switch were closed; every solve
+# first checks that the open ones leave no section without a battery. A
+# state that fails the check (or is singular some other way) is handed to
+# solve_dc, which says what is wrong; a switch state whose factorization
+# failed is remembered and not factored again.
+# Any other edit (wires, components, values) needs a new IncrementalSolver.
+class IncrementalSolver:
+    def __init__(self, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), nets=None,
+                 blocks=()):
+        if len(batteries) == 0:
+            raise ValueError("Add at least one battery.")
+
+        self.wires = wires
+        self.resistors = resistors
+        self.batteries = batteries
+        self.lightbulbs = lightbulbs
+        self.switches = switches
+        self.capacitors = capacitors
+        self.inductors = inductors
+        self.nets = nets
+        self.blocks = blocks
+
+        # Only wires (and DC-shorted inductors) merge nodes, switches are handled in the matrix
+        nodes = NodeMap(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors,
+                        extra=[p for blk in blocks for p in blk.points])
+        nodes.merge_wires(nets)
+        nodes.merge("inductor")
+        self.nodes = nodes
+
+        self.ground_pt = ground_point(batteries)
+        self.links = block_links(nodes, blocks)
+        self.grounds = ground_islands(nodes, self.links + [nodes.ends["switch"]])
+        self.n = nodes.number(self.grounds)
+        m = len(batteries)
+        self.size = self.n + m + len(switches)
+
+        rows, cols, vals = [], [], []
+        self.z = np.zeros((self.size,), dtype=float)
+        self.bulbs = stamp_components(nodes, self.n, resistors, batteries, lightbulbs, rows, cols, vals, self.z)
+        stamp_blocks(nodes, blocks, rows, cols, vals, self.z)
+
+        # Switch k lives in row n + m + k with terminal incidence w. Both of its
+        # states are in the pattern (unused entries hold 0), so the pattern is
+        # the same for every combination of switch states.
+        self.sw_rows = []
+        self.sw_terms = []
+        self.sw_slots = []  # ([(value slot, incidence sign), ...], diagonal slot)
+        root = nodes.roots()
+        sa, sb = nodes.ends["switch"]
+        for k, (ia, ib) in enumerate(zip(*nodes.terminals("switch"))):
+            ia = None if ia < 0 else int(ia)
+            ib = None if ib < 0 else int(ib)
+            if root[sa[k]] == root[sb[k]]:
+                ia = ib = None  # already shorted by wires, never conducts current
+            row = self.n + m + k
+            incidence = []
+            for i, s in ((ia, 1.0), (ib, -1.0)):
+                if i is not None:
+                    incidence += [(len(rows), s), (len(rows) + 1, s)]
+                    rows += [i, row]
+                    cols += [row, i]
+            self.sw_slots.append((incidence, len(rows)))
+            rows.append(row)
+            cols.append(row)
+            self.sw_rows.append(row)
+            self.sw_terms.append((ia, ib))
+        self.vals = np.zeros((len(rows),), dtype=float)
+        self.vals[:len(vals)] = vals
+        self.pattern = MNAPattern(self.size, rows, cols)
+
+        # Switch ends as dense ids of their merged nodes, for conducting()
+        ends, inv = np.unique(np.concatenate([root[sa], root[sb]]), return_inverse=True)
+        self.sw_ends = (inv[:len(sa)].tolist(), inv[len(sa):].tolist())
+        self.sw_nodes = len(ends)
+
+        # Islands without the switches, numbered 0.. for every point, and
+        # which of them hold a battery (for check_islands)
+        parts = DSU(len(nodes.points))
+        for ia, ib in [nodes.ends[kind] for kind in ("resistor", "lightbulb", "battery")] + self.links:
+            parts.union_all(root[ia], root[ib])
+        labels, self.island = np.unique(parts.roots()[root], return_inverse=True)
+        self.powered = np.zeros((len(labels),), dtype=bool)
+        self.powered[self.island[nodes.ends["battery"][1]]] = True
+
+        # The switches' currents come from their rows of the solution
+        self.result_map = ResultMap(nodes, self.grounds, self.ground_pt, wires, resistors, batteries, lightbulbs,
+                                    switches, inductors, blocks)
+
+        self.x = None  # last operating point, where Newton starts from
+        self.x0 = None
+        self.base_state = None
+        self.singular = set()  # switch states (conducting().tobytes()) that failed to factor
+        self.fallbacks = 0  # solves handed to solve_dc
+
+    # Which switches conduct in the matrix: the closed ones that join two
+    # nodes not yet joined by the closed switches before them
+    def conducting(self):
+        sa, sb = self.sw_ends
+        return spanning_edges(sa, sb, self.sw_nodes, part_column(self.switches, "closed") != 0)
+
+    # Matrix values with the switches in the given conducting() state
+    def values(self, state):
+        vals = self.vals.copy()
+        for k, on in enumerate(state.tolist()):
+            incidence, diag = self.sw_slots[k]
+            if on:
+                for slot, s in incidence:
+                    vals[slot] = s
+            else:
+                vals[diag] = 1.0
+        return vals
+
+    # Factor the system with the switches in the given state (bulbs cold)
+    def refactor(self, state):
+        key = state.tobytes()
+        if key in self.singular:
+            raise SingularError(SINGULAR_MSG)
+        try:
+            factor = self.pattern.factor(self.values(state))
+        except SingularError:
+            self.singular.add(key)
+            raise
+        self.x0 = factor.solve(self.z)
+        self.factor = factor
+        self.base_state = state
+        self.Y = {}
+        self.W = self.bulb_columns()
+        self.YW = factor.solve(self.W)
+
+    # Terminal incidence of every bulb, one column each
+    def bulb_columns(self):
+        bulbs = self.bulbs
+        W = np.zeros((self.size + 1, len(bulbs.ohms)), dtype=float)
+        cols = np.arange(len(bulbs.ohms))
+        np.add.at(W, (bulbs.ia, cols), 1.0)
+        np.add.at(W, (bulbs.ib, cols), -1.0)
+        return W[:-1]  # row -1 collected the grounded terminals
+
+    # Dense columns of U for switch k: the incidence vector and the row unit vector
+    def update_columns(self, k):
+        U = np.zeros((self.size, 2), dtype=float)
+        ia, ib = self.sw_terms[k]
+        if ia is not None:
+            U[ia, 0] += 1.0
+        if ib is not None:
+            U[ib, 0] -= 1.0
+        U[self.sw_rows[k], 1] = 1.0
+        return U
+
+    # Raises CircuitError for a section left floating by the open switches.
+    # Only the islands of the other parts are joined here; ground_islands
+    # runs on the full node map just to say which points are floating.
+    def check_islands(self):
+        sa, sb = self.nodes.ends["switch"]
+        closed = part_column(self.switches, "closed") != 0
+        joined = DSU(len(self.powered))
+        joined.union_all(self.island[sa[closed]], self.island[sb[closed]])
+        root = joined.roots()
+        if not np.isin(root[~self.powered], root[self.powered]).all():
+            ground_islands(self.nodes, self.links + [(sa[closed], sb[closed])])
+
+    # A singular state or a failed island check is solved again by solve_dc,
+    # which reports what is wrong with the circuit
+    def solve(self):
+        try:
+            return self.solve_fast()
+        except (SingularError, CircuitError):
+            self.fallbacks += 1
+            return solve_dc(self.wires, self.resistors, self.batteries, self.lightbulbs, self.switches,
+                            self.capacitors, self.inductors, self.nets, blocks=self.blocks)
+
+    def solve_fast(self):
+        self.check_islands()
+        state = self.conducting()
+        bulbs = self.bulbs
+        if len(bulbs.ohms) > MAX_BULB_UPDATES:
+            self.x = newton_solve(self.pattern, self.values(state), self.z, bulbs, self.x)
+            return self.results(self.x, state)
+
+        if self.x0 is None:
+            self.refactor(state)
+        changed = np.nonzero(state != self.base_state)[0].tolist()
+        if len(changed) > MAX_SWITCH_UPDATES:
+            self.refactor(state)
+            changed = []
+
+        # A = A0 + V C V^T with V = [U of every changed switch, W] and C block
+        # diagonal: s * [[0, 1], [1, -1]] per switch, then the bulbs' g - g_cold.
+        # Woodbury in the form that allows zeros in C:
+        # A^-1 b = A0^-1 b - Y (I + C V^T Y)^-1 C V^T A0^-1 b,  Y = A0^-1 V
+        t = len(changed)
+        r = 2 * t + len(bulbs.ohms)
+        V = np.empty((self.size, r), dtype=float)
+        Y = np.empty((self.size, r), dtype=float)
+        C = np.zeros((r, r), dtype=float)
+        for j, k in enumerate(changed):
+            V[:, 2 * j:2 * j + 2] = self.update_columns(k)
+            if k not in self.Y:
+                self.Y[k] = self.factor.solve(V[:, 2 * j:2 * j + 2])
+            Y[:, 2 * j:2 * j + 2] = self.Y[k]
+            s = 1.0 if state[k] else -1.0
+            C[2 * j:2 * j + 2, 2 * j:2 * j + 2] = s * np.array([[0.0, 1.0], [1.0, -1.0]])
+        V[:, 2 * t:] = self.W
+        Y[:, 2 * t:] = self.YW
+        VtY = V.T @ Y
+        g_cold = 1.0 / bulbs.ohms
+        bulb_diag = (np.arange(2 * t, r), np.arange(2 * t, r))
+
+        def solve(i_eq, g):
+            xb = self.x0 - self.YW @ i_eq  # A0^-1 (z with the bulbs' i_eq injected)
+            C[bulb_diag] = g - g_cold
+            M = np.eye(r) + C @ VtY
+            if np.linalg.cond(M) > 1e15:
+                raise SingularError(SINGULAR_MSG)
+            try:
+                return xb - Y @ np.linalg.solve(M, C @ (V.T @ xb))
+            except np.linalg.LinAlgError:
+                raise SingularError(SINGULAR_MSG) from None
+
+        if r == 0:
+            x = self.x0
+        elif not len(bulbs.ohms):
+            x = solve(np.zeros((0,)), np.zeros((0,)))
+        else:
+            # Newton as in newton_factor, every linear solve through the update
+            x = self.x if self.x is not None else solve(np.zeros_like(g_cold), g_cold)
+            for _ in range(NEWTON_MAX_ITER):
+                g, i_eq = bulb_companion(bulbs.ohms, bulbs.voltages(x))
+                x_new = solve(i_eq, g)
+                step = np.max(np.abs(x_new - x))
+                x = x_new
+                if step <= NEWTON_TOL * (1.0 + np.max(np.abs(x))):
+                    break
+            else:
+                raise ValueError(NEWTON_MSG)
+            self.x = x
+
+        return self.results(x, state)
+
+    # Results of solution x, the conducting switches carrying their row's current
+    def results(self, x, state):
+        sa, sb = self.nodes.ends["switch"]
+        rows = np.asarray(self.sw_rows, dtype=np.int64)[state]
+        return self.result_map.results(x, (sa[state], sb[state], x[rows]))
+
+# Canonical hash of everything that changes a DC solution. Part lists are
+# sorted so build order does not matter (the ground goes by battery id, see
+# ground_point). A PartTable counts by its digest and a WireNet (nets, kept
+# in sync with wires) by its own, which makes the key O(1) for the editor's
+# parts. A block counts by its points and port model.
+def circuit_key(wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), blocks=(),
+                nets=None):
+    canon = (
+        sorted(wires) if nets is None else nets.digest,
+        parts_key(resistors, lambda r: (r.id, r.a, r.b, r.ohms)),
+        parts_key(batteries, lambda b: (b.id, b.plus, b.minus, b.volts)),
+        parts_key(lightbulbs, lambda lb: (lb.id, lb.a, lb.b, lb.ohms)),
+        parts_key(switches, lambda sw: (sw.id, sw.a, sw.b, sw.closed)),
+        parts_key(capacitors, lambda c: (c.id, c.a, c.b)),
+        parts_key(inductors, lambda ind: (ind.id, ind.a, ind.b)),
+        sorted((blk.id, blk.points, blk.subcircuit.Y.tolist(), blk.subcircuit.J.tolist()) for blk in blocks),
+    )
+    return hashlib.blake2b(repr(canon).encode(), digest_size=16).digest()
+
+# fields() of every part sorted, or a PartTable's kind, size and digest
+def parts_key(items, fields):
+    if isinstance(items, PartTable):
+        return (items.kind, items.n, items.digest)
+    return sorted(fields(c) for c in items)
+
+# Power / brightness / fire flags are written onto the parts by dc_results;
+# a cached answer has to put them back from its currents.
+def restore_component_state(results, resistors, lightbulbs):
+    point_voltage = results[1]
+    resistor_current = results[2]
+    lightbulb_current = results[4]
+    i = np.array([resistor_current.get(k, 0.0) for k in part_ids(resistors)], dtype=float)
+    set_part_column(resistors, "power", np.abs(i * i * part_column(resistors, "ohms")))
+    i = np.array([lightbulb_current.get(k, 0.0) for k in part_ids(lightbulbs)], dtype=float)
+    dv = (terminal_voltages(point_voltage, part_column(lightbulbs, "a"))
+          - terminal_voltages(point_voltage, part_column(lightbulbs, "b")))
+    set_bulb_states(lightbulbs, i, dv)
+
+# Bounded LRU cache of DC results keyed by circuit_key, so flipping a switch
+# back or undoing an edit returns a circuit that was already solved at once.
+# Unsolvable circuits are cached too and raise the same ValueError again.
+class SolveCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # compute() produces the results on a miss (defaults to solve_dc)
+    def solve(self, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), compute=None,
+              blocks=(), nets=None):
+        key = circuit_key(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors, blocks, nets)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            results = self.entries[key]
+            if isinstance(results, ValueError):
+                raise results.with_traceback(None)
+            restore_component_state(results, resistors, lightbulbs)
+            return results
+
+        self.misses += 1
+        try:
+            if compute is None:
+                results = solve_dc(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors,
+                                   blocks=blocks)
+            else:
+                results = compute()
+        except ValueError as e:
+            results = e
+        self.entries[key] = results
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        if isinstance(results, ValueError):
+            raise results
+        return results
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+# Copy of a part list or PartTable that later edits of the original can't touch
+def copy_parts(items):
+    if isinstance(items, PartTable):
+        return items.copy()
+    return [copy.copy(c) for c in items]
+
+# Runs the editor's DC solves on a background thread so the window never
+# blocks. submit() snapshots the circuit (copies of the parts and of the
+# wire nets' roots, so later edits can't race the solver) and queues it.
+# The snapshot is taken once per `edit`; a switch toggle only copies the
+# switches. A newer submit or cancel() drops the queued one, and the answer
+# to a solve that was overtaken while running is thrown away. The
+# IncrementalSolver of the last topology and the SolveCache live on the
+# worker thread only. `edit` must change with every edit except switch
+# toggles, which reuse the factored solver.
+class SolveWorker:
+    def __init__(self):
+        self.cache = SolveCache()
+        self.engine = None
+        self.engine_edit = None
+        self.wake = threading.Condition()
+        self.job = None   # (job id, edit, snapshot) waiting to run
+        self.latest = 0   # id of the newest job; anything else is outdated
+        self.done = None  # (job id, results or the exception raised)
+        self.snapshot = None
+        self.snapshot_edit = None
+        threading.Thread(target=self.run, name="solve-worker", daemon=True).start()
+
+    # nets, when given, is the WireNet kept in sync with wires
+    def submit(self, edit, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors, nets=None):
+        if self.snapshot is None or self.snapshot_edit != edit:
+            self.snapshot = ((set(wires),) + tuple(copy_parts(items) for items in (resistors, batteries, lightbulbs))
+                             + (None, copy_parts(capacitors), copy_parts(inductors),
+                                None if nets is None else nets.snapshot()))
+            self.snapshot_edit = edit
+        snapshot = self.snapshot[:4] + (copy_parts(switches),) + self.snapshot[5:]
+        with self.wake:
+            self.latest += 1
+            self.job = (self.latest, edit, snapshot)
+            self.done = None
+            self.wake.notify()
+            return self.latest
+
+    def cancel(self):
+        with self.wake:
+            self.latest += 1
+            self.job = None
+            self.done = None
+
+    # The newest job's (results or exception) once, None while it is running
+    def poll(self):
+        with self.wake:
+            done, self.done = self.done, None
+        if done is None:
             return None
-        return idx[root]
+        return done[1]
+
+    def run(self):
+        while True:
+            with self.wake:
+                while self.job is None:
+                    self.wake.wait()
+                jid, edit, snapshot = self.job
+                self.job = None
+            try:
+                results = self.solve(edit, *snapshot)
+            except Exception as e:
+                results = e
+            with self.wake:
+                if jid == self.latest:
+                    self.done = (jid, results)
+
+    def solve(self, edit, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors, nets):
+        if self.engine is not None and self.engine_edit == edit:
+            for mine, sw in zip(self.engine.switches, switches):
+                mine.closed = sw.closed
+            switches = self.engine.switches
+
+        def compute():
+            if self.engine is None or self.engine_edit != edit:
+                self.engine = IncrementalSolver(wires, resistors, batteries, lightbulbs, switches, capacitors,
+                                                inductors, nets)
+                self.engine_edit = edit
+            return self.engine.solve()
+
+        return self.cache.solve(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors,
+                                compute=compute, nets=nets)
+
+# Cap on floats held by one batch of stacked sweep matrices (~128 MB)
+SWEEP_MAX_FLOATS = 1 << 24
+
+# Vectorized DC parameter sweep (e.g. Monte-Carlo tolerance runs).
+# The topology (wires, endpoints, switch states) is stamped once; solve() takes
+# arrays of component values, one row per variant, and solves every variant
+# as a stack of dense systems with a single batched np.linalg.solve (one per
+# Newton iteration when there are lightbulbs).
+class DCSweep:
+    def __init__(self, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+        if len(batteries) == 0:
+            raise ValueError("Add at least one battery.")
+
+        nodes = NodeMap(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+        nodes.merge_wires()
+        nodes.merge("switch", part_column(switches, "closed") != 0)
+        nodes.merge("inductor")
+        n = nodes.number(ground_islands(nodes))
+        m = len(batteries)
+        self.n = n
+        self.size = n + m
+        self.resistors = resistors
+        self.batteries = batteries
+        self.lightbulbs = lightbulbs
+
+        # Matrix index of every grid point, grounds map to the extra slot n
+        self.points = nodes.points
+        self.point_node = np.where(nodes.node < 0, n, nodes.node)
+        self.r_terms = nodes.terminals("resistor", ground=n)
+        self.lb_terms = nodes.terminals("lightbulb", ground=n)
+
+        # Flat positions of the 4 conductance stamps of each two-terminal part.
+        # Stamps landing on ground are sent to a scratch column that is dropped.
+        def conductance_stamps(ia, ib):
+            size = self.size
+            scratch = size * size
+            def flat(i, j):
+                return np.where((i < n) & (j < n), i * size + j, scratch)
+            pos = np.stack([flat(ia, ia), flat(ib, ib), flat(ia, ib), flat(ib, ia)], axis=1)
+            sign = np.array([1.0, 1.0, -1.0, -1.0])
+            return pos.ravel(), sign
+
+        self.r_stamps = conductance_stamps(*self.r_terms)
+        self.lb_stamps = conductance_stamps(*self.lb_terms)
+
+        # Battery rows never change with the swept values
+        A0 = np.zeros((self.size, self.size), dtype=float)
+        for k, terms in enumerate(zip(*nodes.terminals("battery", ground=n))):
+            row = n + k
+            for i, s in zip(terms, (1.0, -1.0)):
+                if i < n:
+                    A0[i, row] += s
+                    A0[row, i] += s
+        self.A0 = A0
+
+    # Each argument is either one value per component or an array of shape
+    # (variants, components); omitted ones keep the values on the objects.
+    # Returns a dict of (variants, ...) arrays in the order of self.points and
+    # of the component lists.
+    def solve(self, ohms=None, volts=None, bulb_ohms=None):
+        def values(arr, items, attr):
+            if arr is None:
+                arr = [getattr(c, attr) for c in items]
+            if not len(items):
+                return np.zeros((1, 0))  # broadcast to every variant below
+            arr = np.asarray(arr, dtype=float)
+            return arr.reshape(-1, len(items)) if arr.ndim < 2 else arr
+
+        ohms = values(ohms, self.resistors, "ohms")
+        volts = values(volts, self.batteries, "volts")
+        bulb_ohms = values(bulb_ohms, self.lightbulbs, "ohms")
+        k = max(len(ohms), len(volts), len(bulb_ohms))
+        ohms = np.broadcast_to(ohms, (k, len(self.resistors)))
+        volts = np.broadcast_to(volts, (k, len(self.batteries)))
+        bulb_ohms = np.broadcast_to(bulb_ohms, (k, len(self.lightbulbs)))
+
+        size, n = self.size, self.n
+        la, lb = self.lb_terms
+        x = np.empty((k, size), dtype=float)
+        # Newton keeps a second copy of the stack around
+        step = max(1, SWEEP_MAX_FLOATS // max(1, 2 * size * size))
+        for s in range(0, k, step):
+            e = min(k, s + step)
+            A = np.zeros((e - s, size * size + 1), dtype=float)
+            A[:, :-1] += self.A0.ravel()
+            pos, sign = self.r_stamps
+            if len(pos):
+                g = (1.0 / ohms[s:e])[:, :, None] * sign
+                np.add.at(A, (slice(None), pos), g.reshape(e - s, -1))
+            z = np.zeros((e - s, size, 1), dtype=float)
+            z[:, n:, 0] = volts[s:e]
+
+            # Newton on the bulbs, starting from their cold resistance
+            r0 = bulb_ohms[s:e]
+            g, i_eq = 1.0 / r0, np.zeros_like(r0)
+            xs = None
+            for _ in range(NEWTON_MAX_ITER):
+                Ak = A.copy()
+                pos, sign = self.lb_stamps
+                if len(pos):
+                    np.add.at(Ak, (slice(None), pos), (g[:, :, None] * sign).reshape(e - s, -1))
+                inj = np.zeros((e - s, n + 1), dtype=float)
+                np.add.at(inj, (slice(None), la), -i_eq)
+                np.add.at(inj, (slice(None), lb), i_eq)
+                zk = z.copy()
+                zk[:, :n, 0] += inj[:, :n]
+                try:
+                    x_new = np.linalg.solve(Ak[:, :-1].reshape(e - s, size, size), zk)[:, :, 0]
+                except np.linalg.LinAlgError:
+                    raise SingularError(SINGULAR_MSG) from None
+                settled = xs is not None and (np.max(np.abs(x_new - xs))
+                                              <= NEWTON_TOL * (1.0 + np.max(np.abs(x_new))))
+                xs = x_new
+                if settled or not len(self.lightbulbs):
+                    break
+                vk = np.concatenate([xs[:, :n], np.zeros((e - s, 1))], axis=1)
+                g, i_eq = bulb_companion(r0, vk[:, la] - vk[:, lb])
+            else:
+                raise ValueError(NEWTON_MSG)
+            x[s:e] = xs
+
+        # Node voltages with ground appended as index n
+        v = np.concatenate([x[:, :n], np.zeros((k, 1))], axis=1)
+        ra, rb = self.r_terms
+        resistor_current = (v[:, ra] - v[:, rb]) / ohms
+        bulb_v = v[:, la] - v[:, lb]
+        lightbulb_current = bulb_v / hot_ohms(bulb_ohms, bulb_v)
+        return {
+            "point_voltage": v[:, self.point_node],
+            "resistor_current": resistor_current,
+            "lightbulb_current": lightbulb_current,
+            "lightbulb_power": lightbulb_current * bulb_v,
+            "battery_current": x[:, n:],
+        }
+
+def sweep_dc(wires, resistors, batteries, lightbulbs, switches, ohms=None, volts=None, bulb_ohms=None,
+             capacitors=(), inductors=()):
+    return DCSweep(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors).solve(ohms, volts, bulb_ohms)
+
+# Frequencies (Hz) of the editor's AC sweep
+AC_FREQS = np.logspace(-2, 3, 101)
+BODE_PATH = "bode.csv"
+
+# Small-signal AC analysis around the DC operating point.
+# The real part G comes from stamp_components (bulbs re-stamped at their
+# dI/dV on the DC solution, or left cold when solve_dc finds none, e.g. a
+# section held to a battery only through capacitors), capacitors add jwC and inductors get a branch
+# row v_a - v_b - jwL i = 0 as in TransientSim, so Y(w) = G + jw B is stamped
+# once. `source` (default the first battery) is driven with 1 V AC and every
+# other battery is an AC short, which makes the probe voltages the transfer
+# functions. solve() stacks Y(w) for a block of frequencies and does one
+# batched complex np.linalg.solve per block.
+class ACSweep:
+    def __init__(self, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=(), source=None):
+        if len(batteries) == 0:
+            raise ValueError("Add at least one battery.")
+
+        nodes = NodeMap(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+        nodes.merge_wires()
+        nodes.merge("switch", part_column(switches, "closed") != 0)
+        n = nodes.number(ground_islands(nodes, [nodes.ends["capacitor"], nodes.ends["inductor"]]))
+        m = len(batteries)
+        size = n + m + len(inductors)
+        self.n = n
+        self.size = size
+
+        # Grid point -> voltage slot: nodes, then n for ground, n + 1 for unknown points
+        def node(p):
+            return int(nodes.point_nodes([p], ground=n, missing=n + 1)[0])
+
+        self.nodes = nodes
+        self.node = node
+        self.points = nodes.points
+
+        rows, cols, vals = [], [], []
+        z = np.zeros((size,), dtype=float)
+        bulbs = stamp_components(nodes, n, resistors, batteries, lightbulbs, rows, cols, vals, z)
+        vals = np.array(vals, dtype=float)
+        if len(lightbulbs):
+            try:
+                pv = solve_dc(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)[1]
+            except ValueError:
+                pv = None
+            if pv is not None:
+                dv = np.array([pv[lb.a] - pv[lb.b] for lb in lightbulbs], dtype=float)
+                vals[bulbs.pos] = bulbs.sign * bulb_companion(bulbs.ohms, dv)[0][bulbs.owner]
+        G = np.zeros((size, size), dtype=float)
+        np.add.at(G, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), vals)
+
+        B = np.zeros((size, size), dtype=float)
+        for farads, i, j in zip(part_column(capacitors, "farads"), *nodes.terminals("capacitor", ground=n)):
+            for p, q, s in ((i, i, 1.0), (j, j, 1.0), (i, j, -1.0), (j, i, -1.0)):
+                if p < n and q < n:
+                    B[p, q] += s * farads
+        for k, (henries, ia, ib) in enumerate(zip(part_column(inductors, "henries"),
+                                                  *nodes.terminals("inductor", ground=n))):
+            row = n + m + k
+            for i, s in ((ia, 1.0), (ib, -1.0)):
+                if i < n:
+                    G[i, row] += s
+                    G[row, i] += s
+            B[row, row] -= henries
+        self.G = G
+        self.B = B
+
+        k = 0 if source is None else next(k for k, b in enumerate(batteries) if b is source)
+        self.z = np.zeros((size,), dtype=complex)
+        self.z[n + k] = 1.0
+
+    # Complex voltages of `points` (default self.points) at every frequency in
+    # Hz, as a (frequencies, points) array
+    def solve(self, freqs, points=None):
+        points = self.points if points is None else list(points)
+        w = 2.0 * np.pi * np.asarray(freqs, dtype=float).ravel()
+        size, n = self.size, self.n
+        x = np.empty((len(w), size), dtype=complex)
+        # Complex entries take two floats
+        step = max(1, SWEEP_MAX_FLOATS // max(1, 2 * size * size))
+        for s in range(0, len(w), step):
+            e = min(len(w), s + step)
+            A = self.G + 1j * w[s:e, None, None] * self.B
+            b = np.broadcast_to(self.z[:, None], (e - s, size, 1))
+            try:
+                x[s:e] = np.linalg.solve(A, b)[:, :, 0]
+            except np.linalg.LinAlgError:
+                raise SingularError(SINGULAR_MSG) from None
+
+        # Ground as slot n, points off the circuit as nan
+        v = np.concatenate([x[:, :n], np.zeros((len(w), 1)), np.full((len(w), 1), np.nan)], axis=1)
+        return v[:, self.nodes.point_nodes(points, ground=n, missing=n + 1)]
+
+# Gain (dB) and unwrapped phase (degrees) of ACSweep.solve output
+def bode(voltage):
+    with np.errstate(divide="ignore"):
+        gain = 20.0 * np.log10(np.abs(voltage))
+    return gain, np.degrees(np.unwrap(np.angle(voltage), axis=0))
+
+def write_bode(path, freqs, points, voltage):
+    gain, phase = bode(voltage)
+    with open(path, "w") as f:
+        f.write(",".join(["freq_hz"] + [f"{name}({x} {y})" for x, y in points for name in ("db", "deg")]) + "\n")
+        for k, hz in enumerate(freqs):
+            f.write(",".join([f"{hz:.6g}"] + [f"{v:.6g}" for pair in zip(gain[k], phase[k]) for v in pair]) + "\n")
+
+# Time-domain simulation with capacitors and inductors.
+# Every step replaces them by companion models (a conductance plus a source
+# carrying the previous state) from backward Euler ("euler") or the
+# trapezoidal rule ("trap"). The matrix only depends on the topology and dt,
+# so it is factored once and each step is one back-substitution with a new
+# right-hand side. Capacitor voltages and inductor currents live on the
+# component objects, so a new TransientSim (after an edit or a switch toggle)
+# carries on from where the last one stopped.
+# Lightbulbs stay stamped cold; the current a hot filament carries less is a
+# source taken from the previous step, so the matrix still never changes.
+class TransientSim:
+    def __init__(self, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors,
+                 dt=TRANSIENT_DT, method="trap", probes=()):
+        if len(batteries) == 0:
+            raise ValueError("Add at least one battery.")
+        if method not in ("euler", "trap"):
+            raise ValueError(f"Unknown integration method {method!r}")
+
+        # Inductors get their own current rows instead of being merged as shorts
+        nodes = NodeMap(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+        nodes.merge_wires()
+        nodes.merge("switch", part_column(switches, "closed") != 0)
+        n = nodes.number(ground_islands(nodes, [nodes.ends["capacitor"], nodes.ends["inductor"]]))
+        m = len(batteries)
+        size = n + m + len(inductors)
+
+        self.dt = dt
+        self.trap = method == "trap"
+        self.t = 0.0
+        self.n = n
+        self.resistors = resistors
+        self.lightbulbs = lightbulbs
+        self.capacitors = capacitors
+        self.inductors = inductors
+
+        # Grid point -> voltage slot: nodes, then n for ground, n + 1 for unknown points
+        def node(p):
+            return int(nodes.point_nodes([p], ground=n, missing=n + 1)[0])
+
+        self.nodes = nodes
+        self.node = node
+        self.r_terms = nodes.terminals("resistor", ground=n)
+        self.lb_terms = nodes.terminals("lightbulb", ground=n)
+        self.c_terms = nodes.terminals("capacitor", ground=n)
+        self.l_terms = nodes.terminals("inductor", ground=n)
+        self.probes = list(probes)
+        self.probe_node = nodes.point_nodes(self.probes, ground=n, missing=n + 1)
+
+        rows, cols, vals = [], [], []
+        self.z0 = np.zeros((size,), dtype=float)
+        self.bulbs = stamp_components(nodes, n, resistors, batteries, lightbulbs, rows, cols, vals, self.z0)
+        self.l_rows = np.arange(n + m, size, dtype=np.int64)
+        farads = part_column(capacitors, "farads")
+        henries = part_column(inductors, "henries")
+
+        # Capacitor companion: conductance G = C/dt (2C/dt for trapezoidal).
+        # Inductor companion: branch row v_a - v_b - R_L i = history, R_L = L/dt (2L/dt).
+        def companion(scale):
+            r, c, v = list(rows), list(cols), list(vals)
+            gc = scale * farads / dt
+            rl = scale * henries / dt
+            for g, i, j in zip(gc, *self.c_terms):
+                for p, q, s in ((i, i, g), (j, j, g), (i, j, -g), (j, i, -g)):
+                    if p < n and q < n:
+                        r.append(p)
+                        c.append(q)
+                        v.append(s)
+            for row, r_l, i, j in zip(self.l_rows, rl, *self.l_terms):
+                for k, s in ((i, 1.0), (j, -1.0)):
+                    if k < n:
+                        r += [k, row]
+                        c += [row, k]
+                        v += [s, s]
+                r.append(row)
+                c.append(row)
+                v.append(-r_l)
+            return MNAFactor(size, r, c, v), gc, rl
+
+        self.factor, self.gc, self.rl = companion(2.0 if self.trap else 1.0)
+        # The trapezoidal rule keeps any jump in capacitor current / inductor
+        # voltage ringing forever, so the first step after (re)starting is
+        # taken with backward Euler instead.
+        self.startup = companion(1.0) if self.trap else None
+
+        self.vc = np.array(part_column(capacitors, "voltage"), dtype=float)
+        self.ic = np.array(part_column(capacitors, "current"), dtype=float)
+        self.il = np.array(part_column(inductors, "current"), dtype=float)
+        self.vl = np.array(part_column(inductors, "voltage"), dtype=float)
+        self.v = np.zeros((n + 2,), dtype=float)
+        self.v[n + 1] = np.nan
+        self.x = np.zeros((size,), dtype=float)
+
+    # Advance one dt; returns (t, probe voltages)
+    def step(self):
+        n = self.n
+        z = self.z0.copy()
+        if self.startup is not None:
+            factor, gc, rl = self.startup
+            trap = False
+            self.startup = None
+        else:
+            factor, gc, rl = self.factor, self.gc, self.rl
+            trap = self.trap
+
+        # Capacitor history sources push I_eq into terminal a and pull it from b
+        ca, cb = self.c_terms
+        i_eq = gc * self.vc
+        if trap:
+            i_eq = i_eq + self.ic
+        inj = np.zeros((n + 2,), dtype=float)
+        np.add.at(inj, ca, i_eq)
+        np.add.at(inj, cb, -i_eq)
+        z[:n] += inj[:n]
+
+        hist = -rl * self.il
+        if trap:
+            hist = hist - self.vl
+        z[self.l_rows] = hist
+
+        bulbs = self.bulbs
+        dv = bulbs.voltages(self.x)
+        z = bulbs.inject(z, dv / hot_ohms(bulbs.ohms, dv) - dv / bulbs.ohms)
+
+        x = factor.solve(z)
+        self.x = x
+        v = self.v
+        v[:n] = x[:n]
+
+        self.vc = v[ca] - v[cb]
+        self.ic = gc * self.vc - i_eq
+        la, lb = self.l_terms
+        self.il = x[self.l_rows]
+        self.vl = v[la] - v[lb]
+        self.t += self.dt
+
+        set_part_column(self.capacitors, "voltage", self.vc)
+        set_part_column(self.capacitors, "current", self.ic)
+        set_part_column(self.inductors, "voltage", self.vl)
+        set_part_column(self.inductors, "current", self.il)
+
+        ra, rb = self.r_terms
+        dv = v[ra] - v[rb]
+        set_part_column(self.resistors, "power", dv * dv / part_column(self.resistors, "ohms"))
+        la, lb = self.lb_terms
+        dv = v[la] - v[lb]
+        set_bulb_states(self.lightbulbs, dv / hot_ohms(part_column(self.lightbulbs, "ohms"), dv), dv)
+
+        return self.t, v[self.probe_node].copy()
+
+    # Stream (t, probe voltages) samples
+    def run(self, steps):
+        for _ in range(steps):
+            yield self.step()
+
+    def point_voltages(self, points):
+        return {p: float(self.v[self.node(p)]) for p in points if self.node(p) <= self.n}
+
+# Netlist files
+# JSON netlists look like
+#   {"wires": [[x1, y1, x2, y2], ...],
+#    "resistors": [{"id": 0, "a": [x, y], "b": [x, y], "ohms": 100.0}, ...],
+#    "batteries": [{"id": 0, "plus": [x, y], "minus": [x, y], "volts": 9.0}, ...],
+#    "lightbulbs": [{"id": 0, "a": [x, y], "b": [x, y], "ohms": 50.0}, ...],
+#    "switches": [{"id": 0, "a": [x, y], "b": [x, y], "closed": true}, ...],
+#    "capacitors": [{"id": 0, "a": [x, y], "b": [x, y], "farads": 0.01}, ...],
+#    "inductors": [{"id": 0, "a": [x, y], "b": [x, y], "henries": 10.0}, ...]}
+# NPZ netlists hold one row per part: wires (k, 4) and resistors, batteries,
+# lightbulbs, switches, capacitors, inductors (k, 5) with the two endpoints
+# followed by the value (ohms, volts, ohms, closed, farads, henries).
+# Ids are the row numbers.
+def netlist_to_dict(wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+    return {
+        "wires": [[p[0], p[1], q[0], q[1]] for (p, q) in sorted(wires)],
+        "resistors": [{"id": r.id, "a": list(r.a), "b": list(r.b), "ohms": r.ohms} for r in resistors],
+        "batteries": [{"id": b.id, "plus": list(b.plus), "minus": list(b.minus), "volts": b.volts} for b in batteries],
+        "lightbulbs": [{"id": lb.id, "a": list(lb.a), "b": list(lb.b), "ohms": lb.ohms} for lb in lightbulbs],
+        "switches": [{"id": sw.id, "a": list(sw.a), "b": list(sw.b), "closed": sw.closed} for sw in switches],
+        "capacitors": [{"id": c.id, "a": list(c.a), "b": list(c.b), "farads": c.farads} for c in capacitors],
+        "inductors": [{"id": ind.id, "a": list(ind.a), "b": list(ind.b), "henries": ind.henries} for ind in inductors],
+    }
+
+def netlist_from_dict(data):
+    def pt(v):
+        return (int(v[0]), int(v[1]))
 
-    # Stamp resistors
-    for r in resistors:
-        ra = dsu.find(r.a)
-        rb = dsu.find(r.b)
-        if ra == rb:
-            continue
-        g = 1.0 / r.ohms
-        i = vi(ra)
-        j = vi(rb)
-        if i is not None:
-            A[i, i] += g
-        if j is not None:
-            A[j, j] += g
-        if i is not None and j is not None:
-            A[i, j] -= g
-            A[j, i] -= g
-
-    # Stamp lightbulbs (they're just resistors)
-    for lb in lightbulbs:
-        ra = dsu.find(lb.a)
-        rb = dsu.find(lb.b)
-        if ra == rb:
+    wires = set()
+    for w in data.get("wires", []):
+        wires.add(norm_edge((int(w[0]), int(w[1])), (int(w[2]), int(w[3]))))
+    resistors = [Resistor(pt(d["a"]), pt(d["b"]), d.get("ohms", DEFAULT_R), d.get("id", k))
+                 for k, d in enumerate(data.get("resistors", []))]
+    batteries = [Battery(pt(d["plus"]), pt(d["minus"]), d.get("volts", DEFAULT_V), d.get("id", k))
+                 for k, d in enumerate(data.get("batteries", []))]
+    lightbulbs = [Lightbulb(pt(d["a"]), pt(d["b"]), d.get("ohms", DEFAULT_BULB_R), d.get("id", k))
+                  for k, d in enumerate(data.get("lightbulbs", []))]
+    switches = []
+    for k, d in enumerate(data.get("switches", [])):
+        sw = Switch(pt(d["a"]), pt(d["b"]), d.get("id", k))
+        sw.closed = bool(d.get("closed", True))
+        switches.append(sw)
+    capacitors = [Capacitor(pt(d["a"]), pt(d["b"]), d.get("farads", DEFAULT_C), d.get("id", k))
+                  for k, d in enumerate(data.get("capacitors", []))]
+    inductors = [Inductor(pt(d["a"]), pt(d["b"]), d.get("henries", DEFAULT_L), d.get("id", k))
+                 for k, d in enumerate(data.get("inductors", []))]
+    return wires, resistors, batteries, lightbulbs, switches, capacitors, inductors
+
+def netlist_from_arrays(arrays):
+    def rows(name, width):
+        if name not in arrays:
+            return np.zeros((0, width))
+        return np.asarray(arrays[name], dtype=float).reshape(-1, width)
+
+    def pt(x, y):
+        return (int(x), int(y))
+
+    wires = {norm_edge(pt(x1, y1), pt(x2, y2)) for x1, y1, x2, y2 in rows("wires", 4)}
+    resistors = [Resistor(pt(ax, ay), pt(bx, by), v, k)
+                 for k, (ax, ay, bx, by, v) in enumerate(rows("resistors", 5))]
+    batteries = [Battery(pt(ax, ay), pt(bx, by), v, k)
+                 for k, (ax, ay, bx, by, v) in enumerate(rows("batteries", 5))]
+    lightbulbs = [Lightbulb(pt(ax, ay), pt(bx, by), v, k)
+                  for k, (ax, ay, bx, by, v) in enumerate(rows("lightbulbs", 5))]
+    switches = []
+    for k, (ax, ay, bx, by, v) in enumerate(rows("switches", 5)):
+        sw = Switch(pt(ax, ay), pt(bx, by), k)
+        sw.closed = bool(v)
+        switches.append(sw)
+    capacitors = [Capacitor(pt(ax, ay), pt(bx, by), v, k)
+                  for k, (ax, ay, bx, by, v) in enumerate(rows("capacitors", 5))]
+    inductors = [Inductor(pt(ax, ay), pt(bx, by), v, k)
+                 for k, (ax, ay, bx, by, v) in enumerate(rows("inductors", 5))]
+    return wires, resistors, batteries, lightbulbs, switches, capacitors, inductors
+
+# Circuit files (.circ) are uncompressed NPZ archives of structured arrays,
+# one table per part kind, so even a 100k part board is a few array reads.
+# Unlike NPZ netlists they keep part ids and switch states.
+CIRCUIT_VERSION = 1
+WIRE_DTYPE = np.dtype([("a", "<i4", (2,)), ("b", "<i4", (2,))])
+PART_DTYPE = np.dtype([("id", "<i8"), ("a", "<i4", (2,)), ("b", "<i4", (2,)), ("value", "<f8")])
+# (table, first terminal, second terminal, value attribute)
+CIRCUIT_TABLES = (
+    ("resistors", "a", "b", "ohms"),
+    ("batteries", "plus", "minus", "volts"),
+    ("lightbulbs", "a", "b", "ohms"),
+    ("switches", "a", "b", "closed"),
+    ("capacitors", "a", "b", "farads"),
+    ("inductors", "a", "b", "henries"),
+)
+
+def circuit_to_arrays(wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+    arrays = {"version": np.array(CIRCUIT_VERSION)}
+    table = np.zeros((len(wires),), dtype=WIRE_DTYPE)
+    if wires:
+        edges = np.array(sorted(wires), dtype=np.int32)
+        table["a"] = edges[:, 0]
+        table["b"] = edges[:, 1]
+    arrays["wires"] = table
+    for (name, a, b, attr), items in zip(CIRCUIT_TABLES, (resistors, batteries, lightbulbs, switches,
+                                                          capacitors, inductors)):
+        if isinstance(items, PartTable):
+            arrays[name] = items.records()
             continue
-        g = 1.0 / lb.ohms
-        i = vi(ra)
-        j = vi(rb)
-        if i is not None:
-            A[i, i] += g
-        if j is not None:
-            A[j, j] += g
-        if i is not None and j is not None:
-            A[i, j] -= g
-            A[j, i] -= g
-
-    # Stamp batteries
-    for k, b in enumerate(batteries):
-        row = n + k
-        rp = dsu.find(b.plus)
-        rm = dsu.find(b.minus)
-
-        ip = vi(rp)
-        im = vi(rm)
-
-        if ip is not None:
-            A[ip, row] += 1.0
-            A[row, ip] += 1.0
-        if im is not None:
-            A[im, row] -= 1.0
-            A[row, im] -= 1.0
-
-        z[row] += b.volts
-
+        table = np.zeros((len(items),), dtype=PART_DTYPE)
+        if items:
+            table["id"] = [c.id for c in items]
+            table["a"] = [getattr(c, a) for c in items]
+            table["b"] = [getattr(c, b) for c in items]
+            table["value"] = [float(getattr(c, attr)) for c in items]
+        arrays[name] = table
+    return arrays
+
+def circuit_from_arrays(arrays):
+    if int(arrays["version"]) > CIRCUIT_VERSION:
+        raise ValueError("Circuit file is from a newer version.")
+
+    w = arrays["wires"]
+    tables = [arrays[name] if name in arrays else np.zeros((0,), dtype=PART_DTYPE) for name, _, _, _ in CIRCUIT_TABLES]
+
+    # Build each distinct grid point once and share the tuple between all parts on it
+    ends = [w["a"], w["b"]]
+    for t in tables:
+        ends += [t["a"], t["b"]]
+    xy = np.concatenate(ends).astype(np.int64).reshape(-1, 2)
+    _, first, inverse = np.unique(xy[:, 0] * (1 << 32) + xy[:, 1], return_index=True, return_inverse=True)
+    points = list(map(tuple, xy[first].tolist()))
+    refs = [points[i] for i in inverse.tolist()]
+    pos = 0
+
+    def take(count):
+        nonlocal pos
+        pos += count
+        return refs[pos - count:pos]
+
+    wires = set(zip(take(len(w)), take(len(w))))
+    parts = []
+    for t in tables:
+        a = take(len(t))
+        b = take(len(t))
+        parts.append(zip(t["id"].tolist(), a, b, t["value"].tolist()))
+
+    resistors = [Resistor(a, b, v, k) for k, a, b, v in parts[0]]
+    batteries = [Battery(a, b, v, k) for k, a, b, v in parts[1]]
+    lightbulbs = [Lightbulb(a, b, v, k) for k, a, b, v in parts[2]]
+    switches = []
+    for k, a, b, v in parts[3]:
+        sw = Switch(a, b, k)
+        sw.closed = bool(v)
+        switches.append(sw)
+    capacitors = [Capacitor(a, b, v, k) for k, a, b, v in parts[4]]
+    inductors = [Inductor(a, b, v, k) for k, a, b, v in parts[5]]
+    return wires, resistors, batteries, lightbulbs, switches, capacitors, inductors
+
+def save_circuit(path, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+    # Through a file object so np.savez doesn't append ".npz"
+    with open(path, "wb") as f:
+        np.savez(f, **circuit_to_arrays(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors))
+
+# Creating 100k+ part objects would otherwise trigger the cyclic GC over and
+# over on a growing heap, which doubles the load time
+def load_circuit(path):
+    was_enabled = gc.isenabled()
+    gc.disable()
     try:
-        x = np.linalg.solve(A, z)
-    except np.linalg.LinAlgError:
-        raise ValueError(
-            "Can't solve circuit (singular).\n"
-            "Check for floating sections or\n"
-            "battery loops with no resistance."
-        )
-
-    node_voltage = {ground: 0.0}
-    for root in node_roots:
-        node_voltage[root] = float(x[idx[root]])
-
-    point_voltage = {}
-    for p in pts:
-        point_voltage[p] = node_voltage[dsu.find(p)]
-
-    resistor_current = {}
-    for r in resistors:
-        va = point_voltage.get(r.a, 0.0)
-        vb = point_voltage.get(r.b, 0.0)
-        i = (va - vb) / r.ohms
-        resistor_current[r.id] = i
-        r.power = abs(i * (va - vb))
-
-    lightbulb_current = {}
-    for lb in lightbulbs:
-        va = point_voltage.get(lb.a, 0.0)
-        vb = point_voltage.get(lb.b, 0.0)
-        i = (va - vb) / lb.ohms
-        lightbulb_current[lb.id] = i
-        lb.current = abs(i)
-        lb.power = abs(i * (va - vb))
-        # Brightness: normalize to ~5W max for full brightness
-        lb.brightness = min(1.0, lb.power / 5.0)
-        
-        # Fire detection: realistic bulb failure
-        # Typical incandescent bulbs rated for ~60W at ~120V (household)
-        # Small bulbs (like our 9V circuits) might be rated for 1-3W
-        # If power exceeds 10W or current exceeds 0.5A, bulb catches fire
-        MAX_SAFE_POWER = 10.0  # Watts
-        MAX_SAFE_CURRENT = 0.5  # Amps
-        
-        if lb.power > MAX_SAFE_POWER or lb.current > MAX_SAFE_CURRENT:
-            lb.on_fire = True
+        with np.load(path) as arrays:
+            return circuit_from_arrays(arrays)
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def export_json(path, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+    with open(path, "w") as f:
+        json.dump(netlist_to_dict(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors), f, indent=1)
+
+# Struct-of-arrays storage for huge boards. A PartTable keeps one kind of part
+# as a record array (PART_DTYPE plus the state that kind carries) instead of
+# one Python object, attribute dict and two point tuples per part. Iterating or indexing it yields PartRow views that read and
+# write the record under the usual attribute names (r.ohms, b.plus,
+# sw.closed, lb.on_fire, ...), so a table goes wherever a part list does;
+# stamp_components reads its columns directly. A view holds its part's id
+# and finds the record through table.slot, so it stays on that part while
+# others are removed (the last record is swapped into the hole, O(1)).
+STORE_DTYPES = {kind: np.dtype(PART_DTYPE.descr + extra) for kind, extra in (
+    ("resistor", [("power", "<f8")]),
+    ("battery", []),
+    ("lightbulb", [("current", "<f8"), ("power", "<f8"), ("brightness", "<f8"), ("on_fire", "?")]),
+    ("switch", [("closed", "?")]),
+    ("capacitor", [("voltage", "<f8"), ("current", "<f8")]),
+    ("inductor", [("voltage", "<f8"), ("current", "<f8")]),
+)}
+
+# (n, 2) array -> list of (x, y) tuples
+def point_tuples(xy):
+    return list(zip(xy[:, 0].tolist(), xy[:, 1].tolist()))
+
+class PartRow:
+    __slots__ = ("table", "pid")
+
+    def __init__(self, table, pid):
+        self.table = table
+        self.pid = pid
+
+    def __eq__(self, other):
+        return isinstance(other, PartRow) and self.table is other.table and self.pid == other.pid
+
+    def __hash__(self):
+        return hash((id(self.table), self.pid))
+
+def row_property(column):
+    def get(self):
+        table = self.table
+        v = table.rec[table.slot[self.pid]][column]
+        return (int(v[0]), int(v[1])) if column in ("a", "b") else v.item()
+
+    def put(self, v):
+        table = self.table
+        k = table.slot[self.pid]
+        if column in DIGEST_COLUMNS:
+            table.digest -= table.row_hash(k)
+            table.rec[column][k] = v
+            table.digest += table.row_hash(k)
         else:
-            lb.on_fire = False
-
-    battery_current = {}
-    for k, b in enumerate(batteries):
-        battery_current[b.id] = float(x[n + k])
-
-    # Calculate wire currents using KCL
-    wire_currents = {}
-    for edge in wires:
-        p1, p2 = edge
-        # Current from p1 to p2
-        current = 0.0
-        
-        # Sum currents from components connected to p1
-        for r in resistors:
-            if r.a == p1:
-                current += resistor_current[r.id]
-            elif r.b == p1:
-                current -= resistor_current[r.id]
-        
-        for lb in lightbulbs:
-            if lb.a == p1:
-                current += lightbulb_current[lb.id]
-            elif lb.b == p1:
-                current -= lightbulb_current[lb.id]
-        
-        for k, b in enumerate(batteries):
-            if b.plus == p1:
-                current += battery_current[b.id]
-            elif b.minus == p1:
-                current -= battery_current[b.id]
-        
-        wire_currents[edge] = current
-
-    return node_voltage, point_voltage, resistor_current, battery_current, lightbulb_current, wire_currents, ground_pt
+            table.rec[column][k] = v
+    return property(get, put)
+
+# Part attribute -> record column, e.g. "plus" -> "a", "volts" -> "value"
+def row_columns(kind, a, b, value):
+    cols = {name: name for name in STORE_DTYPES[kind].names if name not in ("a", "b", "value")}
+    cols.update({a: "a", b: "b"})
+    if value != "closed":
+        cols[value] = "value"
+    return cols
+
+# Record columns that describe the circuit; the others hold solver outputs
+DIGEST_COLUMNS = ("id", "a", "b", "value", "closed")
+
+ROW_COLUMNS = {kind: row_columns(kind, a, b, value) for kind, (_, a, b, value) in zip(PART_KINDS, CIRCUIT_TABLES)}
+ROW_CLASSES = {kind: type(kind.capitalize() + "Row", (PartRow,),
+                          dict({name: row_property(col) for name, col in cols.items()}, __slots__=()))
+               for kind, cols in ROW_COLUMNS.items()}
+
+class PartTable:
+    def __init__(self, kind, records=None):
+        self.kind = kind
+        self.row = ROW_CLASSES[kind]
+        self.rec = np.zeros((0,), dtype=STORE_DTYPES[kind])
+        self.n = 0
+        self.slot = {}  # part id -> record index
+        self.next_id = 0
+        self.keyed = [name for name in DIGEST_COLUMNS if name in self.rec.dtype.names]
+        self.digest = 0  # sum of row_hash() over the parts, kept up to date by every edit
+        if records is not None:
+            self.rec = np.zeros((len(records),), dtype=STORE_DTYPES[kind])
+            for name in PART_DTYPE.names:
+                self.rec[name] = records[name]
+            if kind == "switch":
+                self.rec["closed"] = records["value"] != 0.0
+            self.n = len(records)
+            ids = self.rec["id"].tolist()
+            self.slot = dict(zip(ids, range(self.n)))
+            if len(self.slot) < self.n:
+                raise ValueError(f"Duplicate {kind} ids.")
+            self.next_id = max(ids, default=-1) + 1
+            self.rehash()
+
+    @classmethod
+    def from_parts(cls, kind, items):
+        name = CIRCUIT_TABLES[PART_KINDS.index(kind)][0]
+        lists = {t[0]: items if t[0] == name else () for t in CIRCUIT_TABLES}
+        return cls(kind, circuit_to_arrays((), **lists)[name])
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        row = self.row
+        return (row(self, pid) for pid in self.rec["id"][:self.n].tolist())
+
+    def __getitem__(self, k):
+        if not -self.n <= k < self.n:
+            raise IndexError("part index out of range")
+        return self.row(self, int(self.rec["id"][k % self.n]))
+
+    # The column behind a part attribute (e.g. "ohms", "plus"); terminals
+    # come back as a list of point tuples
+    def get(self, attr):
+        col = ROW_COLUMNS[self.kind][attr]
+        if col in ("a", "b"):
+            return point_tuples(self.rec[col][:self.n])
+        return self.rec[col][:self.n]
+
+    def add(self, a, b, value, pid=None):
+        if self.n == len(self.rec):
+            grown = np.zeros((max(16, 2 * self.n),), dtype=self.rec.dtype)
+            grown[:self.n] = self.rec[:self.n]
+            self.rec = grown
+        if pid is None:
+            pid = self.next_id
+        elif pid in self.slot:
+            raise ValueError(f"Duplicate {self.kind} ids.")
+        self.rec[self.n] = np.zeros((), dtype=self.rec.dtype)
+        self.rec["id"][self.n] = pid
+        self.rec["a"][self.n] = a
+        self.rec["b"][self.n] = b
+        self.rec[ROW_COLUMNS[self.kind][CIRCUIT_TABLES[PART_KINDS.index(self.kind)][3]]][self.n] = value
+        self.slot[pid] = self.n
+        self.next_id = max(self.next_id, pid + 1)
+        self.digest += self.row_hash(self.n)
+        self.n += 1
+        return self.row(self, pid)
+
+    # The last record moves into the removed one's place
+    def remove(self, row):
+        k = self.slot.pop(row.pid)
+        self.digest -= self.row_hash(k)
+        self.n -= 1
+        if k != self.n:
+            self.rec[k] = self.rec[self.n]
+            self.slot[int(self.rec["id"][k])] = k
+
+    # An independent table with the same parts (and ids)
+    def copy(self):
+        out = PartTable(self.kind)
+        out.rec = self.rec[:self.n].copy()
+        out.n = self.n
+        out.slot = dict(self.slot)
+        out.next_id = self.next_id
+        out.digest = self.digest
+        return out
+
+    # Hash of the circuit columns of record k (not the solver outputs)
+    def row_hash(self, k):
+        r = self.rec[k]
+        return hash(b"".join(r[name].tobytes() for name in self.keyed))
+
+    def rehash(self):
+        self.digest = sum(self.row_hash(k) for k in range(self.n))
+
+    # PART_DTYPE records, as stored in .circ files
+    def records(self):
+        out = np.zeros((self.n,), dtype=PART_DTYPE)
+        for name in PART_DTYPE.names:
+            out[name] = self.rec[name][:self.n]
+        if self.kind == "switch":
+            out["value"] = self.rec["closed"][:self.n]
+        return out
+
+    @property
+    def nbytes(self):
+        return self.rec[:self.n].nbytes
+
+# A whole board as arrays: the wire table and one PartTable per kind.
+# store.parts() gives the (wires, resistors, ..., inductors) arguments of
+# solve_dc and the other solvers.
+class PartStore:
+    def __init__(self, arrays=None):
+        if arrays is None:
+            arrays = {"version": np.array(CIRCUIT_VERSION), "wires": np.zeros((0,), dtype=WIRE_DTYPE)}
+        if int(arrays["version"]) > CIRCUIT_VERSION:
+            raise ValueError("Circuit file is from a newer version.")
+        self.wires = np.array(arrays["wires"], dtype=WIRE_DTYPE)
+        self.tables = {kind: PartTable(kind, arrays[name] if name in arrays else np.zeros((0,), dtype=PART_DTYPE))
+                       for kind, (name, _, _, _) in zip(PART_KINDS, CIRCUIT_TABLES)}
+
+    @classmethod
+    def from_parts(cls, wires, resistors, batteries, lightbulbs, switches, capacitors=(), inductors=()):
+        return cls(circuit_to_arrays(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays)
+
+    def to_arrays(self):
+        arrays = {"version": np.array(CIRCUIT_VERSION), "wires": self.wires}
+        for kind, (name, _, _, _) in zip(PART_KINDS, CIRCUIT_TABLES):
+            arrays[name] = self.tables[kind].records()
+        return arrays
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, **self.to_arrays())
+
+    def parts(self):
+        wires = set(zip(point_tuples(self.wires["a"]), point_tuples(self.wires["b"])))
+        return (wires,) + tuple(self.tables[kind] for kind in PART_KINDS)
+
+    @property
+    def nbytes(self):
+        return self.wires.nbytes + sum(t.nbytes for t in self.tables.values())
+
+def load_netlist(path):
+    if path.endswith(".circ"):
+        return load_circuit(path)
+    if path.endswith(".npz"):
+        with np.load(path) as arrays:
+            return netlist_from_arrays(arrays)
+    with open(path) as f:
+        return netlist_from_dict(json.load(f))
+
+def results_to_dict(results):
+    _, point_voltage, resistor_current, battery_current, lightbulb_current, wire_currents, ground_pt = results
+    return {
+        "ground": list(ground_pt),
+        "point_voltage": [[p[0], p[1], v] for p, v in sorted(point_voltage.items())],
+        "resistor_current": {str(k): v for k, v in resistor_current.items()},
+        "battery_current": {str(k): v for k, v in battery_current.items()},
+        "lightbulb_current": {str(k): v for k, v in lightbulb_current.items()},
+        "wire_current": [[p[0], p[1], q[0], q[1], i] for (p, q), i in sorted(wire_currents.items())],
+    }
+
+def results_to_arrays(results):
+    _, point_voltage, resistor_current, battery_current, lightbulb_current, wire_currents, ground_pt = results
+
+    def table(items, width):
+        return np.array(items, dtype=float).reshape(-1, width)
+
+    return {
+        "ground": np.array(ground_pt, dtype=float),
+        "point_voltage": table([[p[0], p[1], v] for p, v in sorted(point_voltage.items())], 3),
+        "resistor_current": table(sorted(resistor_current.items()), 2),
+        "battery_current": table(sorted(battery_current.items()), 2),
+        "lightbulb_current": table(sorted(lightbulb_current.items()), 2),
+        "wire_current": table([[p[0], p[1], q[0], q[1], i] for (p, q), i in sorted(wire_currents.items())], 5),
+    }
+
+def write_results(path, results, fmt):
+    if fmt == "npz":
+        np.savez(path, **results_to_arrays(results))
+    else:
+        with open(path, "w") as f:
+            json.dump(results_to_dict(results), f, indent=1)
+
+# Process pool worker: solve one netlist file, return (input, output, error)
+def solve_netlist_file(job):
+    src, dst, fmt = job
+    try:
+        results = solve_dc(*load_netlist(src))
+    except (ValueError, OSError, KeyError) as e:
+        if fmt == "json":
+            with open(dst, "w") as f:
+                json.dump({"error": str(e)}, f)
+        return src, dst, str(e)
+    write_results(dst, results, fmt)
+    return src, dst, None
+
+# Editor frame profiler (P, Shift+P): phases of one pass of the main loop, in order
+PROFILE_PHASES = ("events", "solve", "transient", "circuit", "panel", "overlay", "fire", "flip", "wait")
+PROFILE_FRAMES = 240  # frames kept for the histograms
+PROFILE_BINS_MS = (0.0, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, math.inf)
+PROFILE_PATH = "profile.csv"
+
+# Per-phase times of the editor's frames. While the overlay is on (start /
+# stop) every frame is a PhaseTimer over self.timings, kept in a ring of the
+# last `frames` frames for the histograms. record() also writes every frame
+# as one row of a CSV trace until stop_record(), with or without the
+# overlay. With neither, its timer measures nothing.
+class FrameProfiler:
+    def __init__(self, phases=PROFILE_PHASES, frames=PROFILE_FRAMES):
+        self.phases = phases
+        self.history = np.zeros((frames, len(phases)), dtype=float)  # milliseconds
+        self.count = 0
+        self.on = False
+        self.trace = None
+        self.frame = 0
+        self.t0 = 0.0
+        self.timings = {}
+        self.timer = PhaseTimer(None)
+
+    def start(self):
+        self.on = True
+        self.count = 0
+        self.begin_frame()
+
+    def stop(self):
+        self.on = False
+
+    def record(self, path):
+        self.trace = open(path, "w")
+        self.trace.write("frame,t," + ",".join(f"{p}_ms" for p in self.phases) + "\n")
+        self.frame = 0
+        self.begin_frame()
+        self.t0 = self.timer.t
+
+    def stop_record(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def begin_frame(self):
+        if self.on or self.trace is not None:
+            self.timings = {}
+            self.timer = PhaseTimer(self.timings)
+        else:
+            self.timer = PhaseTimer(None)
+
+    def end_frame(self):
+        if not self.on and self.trace is None:
+            return
+        row = [self.timings.get(p, 0.0) * 1e3 for p in self.phases]
+        if self.on:
+            self.history[self.count % len(self.history)] = row
+            self.count += 1
+        if self.trace is not None:
+            self.frame += 1
+            self.trace.write(f"{self.frame},{self.timer.t - self.t0:.6f}," + ",".join(f"{v:.4f}" for v in row)
+                             + "\n")
+
+    # (phase, mean ms, max ms, counts per PROFILE_BINS_MS bin) over the kept frames
+    def histograms(self):
+        data = self.history[:min(self.count, len(self.history))]
+        out = []
+        for k, phase in enumerate(self.phases):
+            col = data[:, k]
+            counts = np.bincount(np.searchsorted(PROFILE_BINS_MS, col, side="right") - 1,
+                                 minlength=len(PROFILE_BINS_MS) - 1)
+            out.append((phase, float(col.mean()) if len(col) else 0.0, float(col.max()) if len(col) else 0.0, counts))
+        return out
 
 # UI
 class Button:
@@ -388,19 +2663,18 @@ def main():
 
     tool = "WIRE"
     wires = set()
-    resistors = []
-    batteries = []
-    lightbulbs = []
-    switches = []
-
-    next_r = 0
-    next_b = 0
-    next_lb = 0
-    next_sw = 0
+    nets = WireNet()  # kept in sync with wires
+    parts = PartIndex()  # kept in sync with the part tables
+    store = PartStore()  # one PartTable per kind (its wire table is unused, see wires)
+    resistors, batteries, lightbulbs, switches, capacitors, inductors = store.parts()[1:]
 
     current_orientation = 0  # index into ORIENTATIONS
 
     solved = False
+    worker = SolveWorker()
+    edit_count = 0  # bumped on every edit but switch toggles, see SolveWorker
+    solving = False  # a solve is running on the worker
+    transient = None  # TransientSim while the T mode is running
     pointV = {}
     rI = {}
     bI = {}
@@ -408,6 +2682,9 @@ def main():
     wireI = {}
     ground_pt = None
     last_error = ""
+    error_points = []  # grid points a CircuitError blamed
+    notice = ""  # result of the last save / load / export
+    profiler = FrameProfiler()
 
     input_dialog = None
 
@@ -428,6 +2705,7 @@ def main():
 
     wire_start = None
     wire_end = None
+    wire_route = None  # ((start, end), path) of the last routed drag
     dragging_wire = False
 
     ghost_component = None  # (type, grid_pos, orientation_idx)
@@ -451,8 +2729,24 @@ def main():
         x, y = mouse_from_grid(gp)
         return (PANEL_W + 10 <= x <= W - 10) and (10 <= y <= H - 10)
 
-    def add_wire_path(p0, p1):
-        path = manhattan_path(p0, p1)
+    # Obstacles of the wire router: parts, other wires and the edge of the board
+    def wire_blocked(p):
+        return p in parts.covered or p in nets.adj or not in_bounds(p)
+
+    # Route of the wire being dragged, worked out at most once per end point.
+    # With Shift held it is the plain L path, straight through whatever is there.
+    def dragged_path():
+        nonlocal wire_route
+        key = (wire_start, wire_end, bool(pygame.key.get_mods() & pygame.KMOD_SHIFT))
+        if wire_route is None or wire_route[0] != key:
+            if key[2]:
+                path = manhattan_path(wire_start, wire_end)
+            else:
+                path = route_wire(wire_start, wire_end, wire_blocked)
+            wire_route = (key, path)
+        return wire_route[1]
+
+    def add_wire_path(path):
         for i in range(len(path) - 1):
             a = path[i]
             b = path[i + 1]
@@ -460,75 +2754,518 @@ def main():
                 continue
             if abs(a[0]-b[0]) + abs(a[1]-b[1]) != 1:
                 continue
-            wires.add(norm_edge(a, b))
+            e = norm_edge(a, b)
+            if e not in wires:
+                wires.add(e)
+                nets.add(e)
 
     def get_component_at(gp):
-        for r in resistors:
-            if gp in (r.a, r.b):
-                return ('resistor', r)
-        for b in batteries:
-            if gp in (b.plus, b.minus):
-                return ('battery', b)
-        for lb in lightbulbs:
-            if gp in (lb.a, lb.b):
-                return ('lightbulb', lb)
-        for sw in switches:
-            if gp in (sw.a, sw.b):
-                return ('switch', sw)
-        return None
+        return parts.find(gp)
 
     def erase_at(gp):
-        nonlocal resistors, batteries, lightbulbs, switches, wires, solved
-        
         x, y = gp
         nbrs = [(x+1,y),(x-1,y),(x,y+1),(x,y-1)]
         for q in nbrs:
             e = norm_edge(gp, q)
             if e in wires:
                 wires.remove(e)
-                solved = False
+                nets.remove(e)
+                circuit_edited()
                 return
 
-        resistors = [r for r in resistors if gp not in (r.a, r.b)]
-        batteries = [b for b in batteries if gp not in (b.plus, b.minus)]
-        lightbulbs = [lb for lb in lightbulbs if gp not in (lb.a, lb.b)]
-        switches = [sw for sw in switches if gp not in (sw.a, sw.b)]
-        solved = False
+        hits = parts.at.get(gp)
+        if not hits:
+            return
+        for kind, comp in list(hits):
+            parts.remove(comp)
+            store.tables[kind].remove(comp)
+        circuit_edited()
 
     def solve_now():
-        nonlocal solved, pointV, rI, bI, lbI, wireI, last_error, ground_pt
+        nonlocal transient, solving, layer_dirty
+        transient = None
+        layer_dirty = True
+        profiler.timer.mark("events")
+        worker.submit(edit_count, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors, nets)
+        solving = True
+        profiler.timer.mark("solve")
+
+    # Show the worker's answer once the newest solve is done
+    def collect_solve():
+        nonlocal solved, solving, pointV, rI, bI, lbI, wireI, last_error, error_points, ground_pt, layer_dirty
+        results = worker.poll()
+        if results is None:
+            return
+        solving = False
+        layer_dirty = True
+        if isinstance(results, Exception):
+            solved = False
+            last_error = str(results)
+            error_points = getattr(results, "points", [])
+            return
+        _, pointV, rI, bI, lbI, wireI, ground_pt = results
+        restore_component_state(results, resistors, lightbulbs)
+        solved = True
+        last_error = ""
+        error_points = []
+
+    def cancel_solve():
+        nonlocal solving
+        if solving:
+            worker.cancel()
+            solving = False
+
+    # (Re)build the transient simulation; without reset it continues from the
+    # capacitor/inductor state left by the previous one
+    def start_transient(reset):
+        nonlocal transient, solved, rI, bI, lbI, wireI, last_error, error_points, layer_dirty
+        cancel_solve()
+        layer_dirty = True
+        if reset:
+            for items in (capacitors, inductors):
+                set_part_column(items, "voltage", 0.0)
+                set_part_column(items, "current", 0.0)
+        t0 = 0.0 if reset or transient is None else transient.t
+        profiler.timer.mark("events")
         try:
-            _, pointV, rI, bI, lbI, wireI, ground_pt = solve_dc(wires, resistors, batteries, lightbulbs, switches)
+            transient = TransientSim(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+            transient.t = t0
             solved = True
+            rI, bI, lbI, wireI = {}, {}, {}, {}
             last_error = ""
+            error_points = []
         except Exception as e:
+            transient = None
             solved = False
             last_error = str(e)
+            error_points = getattr(e, "points", [])
+        profiler.timer.mark("solve")
+
+    def circuit_edited():
+        nonlocal solved, edit_count, layer_dirty
+        cancel_solve()
+        solved = False
+        edit_count += 1
+        layer_dirty = True
+        if transient is not None:
+            start_transient(reset=False)
+
+    def toggle_switch(sw):
+        nonlocal solved, layer_dirty
+        sw.closed = not sw.closed
+        layer_dirty = True
+        if transient is not None:
+            start_transient(reset=False)
+        # Auto-run if already solved once
+        elif solved or len(pointV) > 0:
+            solve_now()
+        else:
+            solved = False
+
+    def save_board():
+        nonlocal notice, last_error
+        try:
+            save_circuit(SAVE_PATH, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+            notice = f"Saved {SAVE_PATH}"
+        except OSError as e:
+            last_error = str(e)
+
+    def export_board():
+        nonlocal notice, last_error
+        try:
+            export_json(EXPORT_PATH, wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+            notice = f"Exported {EXPORT_PATH}"
+        except OSError as e:
+            last_error = str(e)
+
+    def ac_sweep():
+        nonlocal notice, last_error, error_points
+        probes = sorted(voltage_probes)
+        if not probes:
+            last_error = "Place voltage probes (V) first."
+            return
+        profiler.timer.mark("events")
+        try:
+            ac = ACSweep(wires, resistors, batteries, lightbulbs, switches, capacitors, inductors)
+            write_bode(BODE_PATH, AC_FREQS, probes, ac.solve(AC_FREQS, probes))
+        except (ValueError, OSError) as e:
+            last_error = str(e)
+            error_points = getattr(e, "points", [])
+            return
+        finally:
+            profiler.timer.mark("solve")
+        last_error = ""
+        error_points = []
+        notice = f"Bode data of {len(probes)} probe(s) in {BODE_PATH}"
+
+    def toggle_profiler():
+        if profiler.on:
+            profiler.stop()
+        else:
+            profiler.start()
+
+    def toggle_trace():
+        nonlocal notice, last_error
+        if profiler.trace is not None:
+            profiler.stop_record()
+            notice = f"Frame trace in {PROFILE_PATH}"
+            return
+        try:
+            profiler.record(PROFILE_PATH)
+            notice = f"Recording the frame trace to {PROFILE_PATH}"
+        except OSError as e:
+            last_error = str(e)
+
+    def load_board():
+        nonlocal wires, nets, store, resistors, batteries, lightbulbs, switches, capacitors, inductors
+        nonlocal notice, last_error
+        try:
+            loaded = PartStore.load(SAVE_PATH)
+        except (ValueError, OSError, KeyError) as e:
+            last_error = str(e)
+            return
+        clear_all()
+        store = loaded
+        wires, resistors, batteries, lightbulbs, switches, capacitors, inductors = store.parts()
+        nets = WireNet(wires)
+        for kind in PART_KINDS:
+            for c in store.tables[kind]:
+                parts.add(kind, c)
+        notice = f"Loaded {SAVE_PATH}"
+        circuit_edited()
 
     def clear_all():
-        nonlocal wires, resistors, batteries, lightbulbs, switches, wire_start, wire_end, solved, pointV, rI, bI, lbI, wireI, last_error, ghost_component, voltage_probes, current_probes
+        nonlocal wires, nets, parts, store, resistors, batteries, lightbulbs, switches, capacitors, inductors, wire_start, wire_end, solved, edit_count, transient, pointV, rI, bI, lbI, wireI, last_error, error_points, ghost_component, voltage_probes, current_probes, layer_dirty
         wires = set()
-        resistors = []
-        batteries = []
-        lightbulbs = []
-        switches = []
+        nets = WireNet()
+        parts = PartIndex()
+        store = PartStore()
+        resistors, batteries, lightbulbs, switches, capacitors, inductors = store.parts()[1:]
         wire_start = None
         wire_end = None
+        cancel_solve()
         solved = False
+        edit_count += 1
+        transient = None
         pointV, rI, bI, lbI, wireI = {}, {}, {}, {}, {}
         last_error = ""
+        error_points = []
         ghost_component = None
         voltage_probes = set()
         current_probes = set()
+        layer_dirty = True
+
+    # Wires and parts, drawn into the cached circuit layer.
+    # Returns the centres of burning bulbs, which are animated per frame.
+    def draw_circuit(surf):
+        burning = []
+
+        # Wires
+        for (a, b) in wires:
+            x1, y1 = mouse_from_grid(a)
+            x2, y2 = mouse_from_grid(b)
+            pygame.draw.line(surf, (20, 20, 20), (x1, y1), (x2, y2), WIRE_WIDTH)
+
+        # Components
+        for r in resistors:
+            draw_line(surf, r.a, r.b, (70, 70, 70), 7)
+            mx = (mouse_from_grid(r.a)[0] + mouse_from_grid(r.b)[0]) / 2
+            my = (mouse_from_grid(r.a)[1] + mouse_from_grid(r.b)[1]) / 2
+            label = f"{r.ohms:g}Ω"
+            if solved and r.id in rI:
+                label += f" {r.power:.2f}W"
+            surf.blit(tiny.render(label, True, (10, 10, 10)), (mx + 8, my - 18))
+
+        for b in batteries:
+            draw_line(surf, b.plus, b.minus, (40, 40, 40), 8)
+            xP, yP = mouse_from_grid(b.plus)
+            xM, yM = mouse_from_grid(b.minus)
+            pygame.draw.circle(surf, (200, 50, 50), (int(xP), int(yP)), 8)
+            pygame.draw.circle(surf, (50, 50, 200), (int(xM), int(yM)), 8)
+            surf.blit(tiny.render("+", True, (255, 255, 255)), (xP - 4, yP - 8))
+            surf.blit(tiny.render("-", True, (255, 255, 255)), (xM - 5, yM - 8))
+
+            mx = (xP + xM) / 2
+            my = (yP + yM) / 2
+            label = f"{b.volts:g}V"
+            if solved and b.id in bI:
+                label += f" {bI[b.id]:.3g}A"
+            surf.blit(tiny.render(label, True, (10, 10, 10)), (mx + 8, my - 18))
+
+        for lb in lightbulbs:
+            x1, y1 = mouse_from_grid(lb.a)
+            x2, y2 = mouse_from_grid(lb.b)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            
+            # Draw connection lines
+            pygame.draw.line(surf, (60, 60, 60), (x1, y1), (mx, my), 4)
+            pygame.draw.line(surf, (60, 60, 60), (mx, my), (x2, y2), 4)
+            
+            # Draw bulb shape - realistic bulb
+            bulb_radius = 18
+            
+            # Glass bulb (circle)
+            if solved and lb.on_fire:
+                # Burning bulbs are animated every frame on top of this layer
+                burning.append((mx, my))
+                
+            elif solved:
+                # Normal bulb with brightness
+                brightness = int(255 * lb.brightness)
+                # Bulb glows yellow when lit
+                glow_color = (brightness, brightness, min(100 + int(brightness * 0.7), 255))
+                inner_glow = max(0, brightness - 50)
+                
+                # Outer glow effect
+                if brightness > 50:
+                    for r in range(bulb_radius + 8, bulb_radius, -2):
+                        alpha_glow = int((brightness / 255) * 30)
+                        glow_surf = pygame.Surface((r*2, r*2), pygame.SRCALPHA)
+                        pygame.draw.circle(glow_surf, (*glow_color, alpha_glow), (r, r), r)
+                        surf.blit(glow_surf, (int(mx - r), int(my - r)))
+                
+                # Glass bulb
+                pygame.draw.circle(surf, glow_color, (int(mx), int(my)), bulb_radius)
+                
+                # Filament (brighter center)
+                if brightness > 20:
+                    filament_color = (255, 255, min(255, 150 + inner_glow))
+                    pygame.draw.circle(surf, filament_color, (int(mx), int(my)), int(bulb_radius * 0.4))
+                
+                # Glass outline
+                pygame.draw.circle(surf, (120, 120, 120), (int(mx), int(my)), bulb_radius, 2)
+            else:
+                # Unlit bulb
+                pygame.draw.circle(surf, (200, 200, 200), (int(mx), int(my)), bulb_radius)
+                pygame.draw.circle(surf, (100, 100, 100), (int(mx), int(my)), bulb_radius, 2)
+                # Filament visible when off
+                pygame.draw.line(surf, (80, 80, 80), 
+                               (int(mx - 6), int(my - 3)), 
+                               (int(mx + 6), int(my + 3)), 2)
+            
+            # Screw base
+            base_rect = pygame.Rect(int(mx - 6), int(my + bulb_radius - 5), 12, 8)
+            pygame.draw.rect(surf, (150, 150, 150), base_rect)
+            pygame.draw.line(surf, (100, 100, 100), 
+                           (base_rect.left, base_rect.top + 3),
+                           (base_rect.right, base_rect.top + 3), 1)
+            pygame.draw.line(surf, (100, 100, 100), 
+                           (base_rect.left, base_rect.top + 6),
+                           (base_rect.right, base_rect.top + 6), 1)
+            
+            # Label
+            label = f"{lb.ohms:g}Ω"
+            if solved:
+                if lb.on_fire:
+                    label += " 🔥 OVERLOAD!"
+                    label_color = (255, 0, 0)
+                else:
+                    label += f" {lb.power:.2f}W"
+                    label_color = (10, 10, 10)
+            else:
+                label_color = (10, 10, 10)
+            surf.blit(tiny.render(label, True, label_color), (mx + 24, my - 18))
+
+        # Draw switches
+        for sw in switches:
+            x1, y1 = mouse_from_grid(sw.a)
+            x2, y2 = mouse_from_grid(sw.b)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            
+            # Draw terminals
+            pygame.draw.circle(surf, (100, 100, 100), (int(x1), int(y1)), 6)
+            pygame.draw.circle(surf, (100, 100, 100), (int(x2), int(y2)), 6)
+            
+            if sw.closed:
+                # Closed switch - straight line
+                pygame.draw.line(surf, (50, 150, 50), (x1, y1), (x2, y2), 5)
+                status = "CLOSED"
+                status_color = (0, 150, 0)
+            else:
+                # Open switch - angled line to show it's open
+                dx, dy = x2 - x1, y2 - y1
+                length = math.sqrt(dx*dx + dy*dy)
+                if length > 0:
+                    # Draw line from a to midpoint, then angled up
+                    mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
+                    # Perpendicular offset
+                    perp_x, perp_y = -dy / length, dx / length
+                    open_x = mid_x + perp_x * 15
+                    open_y = mid_y + perp_y * 15
+                    
+                    pygame.draw.line(surf, (200, 50, 50), (x1, y1), (open_x, open_y), 5)
+                    pygame.draw.line(surf, (200, 50, 50), (open_x, open_y), (x2, y2), 5)
+                status = "OPEN"
+                status_color = (200, 0, 0)
+            
+            # Label
+            label = f"SW{sw.id} {status}"
+            surf.blit(tiny.render(label, True, status_color), (mx + 8, my - 25))
+            surf.blit(tiny.render("(click to toggle)", True, (100, 100, 100)), (mx + 8, my - 10))
+
+        # Draw capacitors: two plates across the middle
+        for c in capacitors:
+            x1, y1 = mouse_from_grid(c.a)
+            x2, y2 = mouse_from_grid(c.b)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            dx, dy = x2 - x1, y2 - y1
+            length = math.sqrt(dx*dx + dy*dy)
+            ux, uy = dx / length, dy / length
+            px, py = -uy, ux
+            gap = 4
+            pygame.draw.line(surf, (60, 60, 60), (x1, y1), (mx - ux * gap, my - uy * gap), 4)
+            pygame.draw.line(surf, (60, 60, 60), (mx + ux * gap, my + uy * gap), (x2, y2), 4)
+            for s in (-gap, gap):
+                cx, cy = mx + ux * s, my + uy * s
+                pygame.draw.line(surf, (30, 90, 160), (cx - px * 12, cy - py * 12), (cx + px * 12, cy + py * 12), 4)
+            label = f"{c.farads:g}F"
+            if transient is not None:
+                label += f" {c.voltage:.2f}V"
+            surf.blit(tiny.render(label, True, (10, 10, 10)), (mx + 14, my - 22))
+
+        # Draw inductors: a row of coil loops
+        for ind in inductors:
+            x1, y1 = mouse_from_grid(ind.a)
+            x2, y2 = mouse_from_grid(ind.b)
+            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+            pygame.draw.line(surf, (60, 60, 60), (x1, y1), (x2, y2), 3)
+            for k in range(4):
+                t = (k + 0.5) / 4
+                cx = x1 + (x2 - x1) * (0.2 + 0.6 * t)
+                cy = y1 + (y2 - y1) * (0.2 + 0.6 * t)
+                pygame.draw.circle(surf, (150, 90, 30), (int(cx), int(cy)), 6, 2)
+            label = f"{ind.henries:g}H"
+            if transient is not None:
+                label += f" {ind.current:.3g}A"
+            surf.blit(tiny.render(label, True, (10, 10, 10)), (mx + 10, my - 22))
+
+        return burning
+
+    def draw_fire(mx, my):
+        bulb_radius = 18
+        # FIRE! Draw animated fire effect
+        fire_colors = [
+            (255, 69, 0),   # Red-orange
+            (255, 140, 0),  # Dark orange
+            (255, 215, 0),  # Gold
+            (255, 69, 0),   # Red-orange
+        ]
+        # Draw multiple flame particles
+        for _ in range(8):
+            offset_x = random.randint(-8, 8)
+            offset_y = random.randint(-12, -2)
+            flame_size = random.randint(4, 10)
+            color = random.choice(fire_colors)
+            flame_x = int(mx + offset_x)
+            flame_y = int(my + offset_y)
+            pygame.draw.circle(screen, color, (flame_x, flame_y), flame_size)
+        
+        # Draw smoke
+        smoke_color = (80, 80, 80)
+        for i in range(3):
+            smoke_y = int(my - 15 - i * 8)
+            smoke_size = 5 + i * 2
+            pygame.draw.circle(screen, smoke_color, (int(mx), smoke_y), smoke_size)
+        
+        # Blackened bulb
+        pygame.draw.circle(screen, (40, 40, 40), (int(mx), int(my)), bulb_radius)
+        pygame.draw.circle(screen, (20, 20, 20), (int(mx), int(my)), bulb_radius, 3)
+
+        # Screw base
+        base_rect = pygame.Rect(int(mx - 6), int(my + bulb_radius - 5), 12, 8)
+        pygame.draw.rect(screen, (150, 150, 150), base_rect)
+        pygame.draw.line(screen, (100, 100, 100), 
+                       (base_rect.left, base_rect.top + 3),
+                       (base_rect.right, base_rect.top + 3), 1)
+        pygame.draw.line(screen, (100, 100, 100), 
+                       (base_rect.left, base_rect.top + 6),
+                       (base_rect.right, base_rect.top + 6), 1)
+
+    def draw_line(surf, p0, p1, color, width):
+        x1, y1 = mouse_from_grid(p0)
+        x2, y2 = mouse_from_grid(p1)
+        pygame.draw.line(surf, color, (x1, y1), (x2, y2), width)
+
+    # Mean / max ms of every phase over the last frames, with a histogram of
+    # frame counts per PROFILE_BINS_MS bin (log height)
+    def draw_profiler():
+        rows = profiler.histograms()
+        bins = len(PROFILE_BINS_MS) - 1
+        box_w, row_h = 330, 20
+        box_x, box_y = W - box_w - 10, 30
+        box = pygame.Surface((box_w, 28 + row_h * len(rows)))
+        box.fill((255, 255, 255))
+        box.set_alpha(225)
+        screen.blit(box, (box_x, box_y))
+        pygame.draw.rect(screen, (120, 120, 120), (box_x, box_y, box_w, box.get_height()), 1)
+        edges = " ".join(f"{e:g}" for e in PROFILE_BINS_MS[1:-1])
+        screen.blit(tiny.render(f"ms: mean max | bins {edges}", True, (60, 60, 60)), (box_x + 6, box_y + 4))
+        top = max((int(c.max()) for _, _, _, c in rows), default=0)
+        for k, (phase, mean, peak, counts) in enumerate(rows):
+            y = box_y + 24 + k * row_h
+            screen.blit(tiny.render(f"{phase:<9} {mean:6.2f} {peak:6.2f}", True, (20, 20, 20)), (box_x + 6, y))
+            for b in range(bins):
+                h = 0 if counts[b] == 0 else int(2 + (row_h - 6) * math.log1p(counts[b]) / math.log1p(max(1, top)))
+                x = box_x + box_w - 8 - (bins - b) * 14
+                pygame.draw.rect(screen, (70, 120, 200) if b < bins - 1 else (200, 70, 70),
+                                 (x, y + row_h - 4 - h, 11, h))
+
+    # Render layers: the grid is drawn once, the circuit layer (grid + wires +
+    # parts) only when layer_dirty is set. Probes, ghost previews and fire
+    # are drawn over it every frame.
+    grid_layer = pygame.Surface((W, H))
+    grid_layer.fill((250, 250, 250))
+    gx_min, gx_max = -5, int((W - PANEL_W - 2 * GRID_MARGIN) / GRID_SPACING) + 5
+    gy_min, gy_max = -2, int((H - 2 * GRID_MARGIN) / GRID_SPACING) + 2
+    for gx in range(gx_min, gx_max + 1):
+        for gy in range(gy_min, gy_max + 1):
+            p = (gx, gy)
+            if not in_bounds(p):
+                continue
+            x, y = mouse_from_grid(p)
+            pygame.draw.circle(grid_layer, (220, 220, 220), (int(x), int(y)), NODE_RADIUS)
+
+    circuit_layer = pygame.Surface((W, H))
+    layer_dirty = True
+    burning = []
+
+    # Watermark in center of canvas
+    # Try cursive fonts, fallback to italic
+    available_fonts = pygame.font.get_fonts()
+    cursive_fonts = ['brushscriptmt', 'brushscript', 'lucidahandwriting', 'zapfchancery', 'mistral']
+    
+    watermark_font = None
+    for font_name in cursive_fonts:
+        if font_name in available_fonts:
+            try:
+                watermark_font = pygame.font.SysFont(font_name, 72)
+                break
+            except:
+                continue
+    
+    if watermark_font is None:
+        # Fallback to italic
+        watermark_font = pygame.font.SysFont("Arial", 60, italic=True)
+    
+    watermark_text = "Ganeev's Circuit Sim"
+    watermark_surf = watermark_font.render(watermark_text, True, (180, 180, 180))
+    watermark_surf.set_alpha(120)  # More visible but still faded
+    watermark_x = PANEL_W + (W - PANEL_W - watermark_surf.get_width()) // 2
+    watermark_y = (H - watermark_surf.get_height()) // 2
 
     clock = pygame.time.Clock()
 
     while True:
+        profiler.begin_frame()
+        if solving:
+            collect_solve()
+            profiler.timer.mark("solve")
         mouse_pos = pygame.mouse.get_pos()
         mouse_grid = grid_from_mouse(*mouse_pos)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                profiler.stop_record()
                 pygame.quit()
                 return
 
@@ -544,7 +3281,11 @@ def main():
                             comp.volts = input_dialog.result[0]
                         elif comp_type == 'lightbulb':
                             comp.ohms = input_dialog.result[0]
-                        solved = False
+                        elif comp_type == 'capacitor':
+                            comp.farads = input_dialog.result[0]
+                        elif comp_type == 'inductor':
+                            comp.henries = input_dialog.result[0]
+                        circuit_edited()
                     input_dialog = None
                 continue
 
@@ -554,15 +3295,33 @@ def main():
                 if event.key == pygame.K_3: tool = "BAT"
                 if event.key == pygame.K_4: tool = "BULB"
                 if event.key == pygame.K_5: tool = "SWITCH"
+                if event.key == pygame.K_6: tool = "CAP"
+                if event.key == pygame.K_7: tool = "IND"
                 if event.key == pygame.K_v: tool = "VPROBE"
                 if event.key == pygame.K_i: tool = "IPROBE"
                 if event.key == pygame.K_e: tool = "ERASE"
                 if event.key == pygame.K_r: solve_now()
                 if event.key == pygame.K_c: clear_all()
+                if event.key == pygame.K_s: save_board()
+                if event.key == pygame.K_l: load_board()
+                if event.key == pygame.K_j: export_board()
+                if event.key == pygame.K_a: ac_sweep()
+                if event.key == pygame.K_p:
+                    if event.mod & pygame.KMOD_SHIFT:
+                        toggle_trace()
+                    else:
+                        toggle_profiler()
+                if event.key == pygame.K_t:
+                    if transient is None:
+                        start_transient(reset=True)
+                    else:
+                        transient = None
+                        solved = False
+                        layer_dirty = True
 
             if event.type == pygame.MOUSEWHEEL:
                 # Rotate component orientation
-                if tool in ("RES", "BAT", "BULB"):
+                if tool in ("RES", "BAT", "BULB", "CAP", "IND"):
                     current_orientation = (current_orientation + event.y) % 4
 
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -581,14 +3340,13 @@ def main():
                                 input_dialog = InputDialog("Edit Battery", [("Voltage (V)", comp.volts)])
                             elif comp_type == 'lightbulb':
                                 input_dialog = InputDialog("Edit Lightbulb", [("Resistance (Ω)", comp.ohms)])
+                            elif comp_type == 'capacitor':
+                                input_dialog = InputDialog("Edit Capacitor", [("Capacitance (F)", comp.farads)])
+                            elif comp_type == 'inductor':
+                                input_dialog = InputDialog("Edit Inductor", [("Inductance (H)", comp.henries)])
                             elif comp_type == 'switch':
                                 # Toggle switch instead of edit
-                                comp.closed = not comp.closed
-                                # Auto-run if already solved once
-                                if solved or len(pointV) > 0:
-                                    solve_now()
-                                else:
-                                    solved = False
+                                toggle_switch(comp)
                                 continue
                             input_dialog.component = comp_info
                     continue
@@ -615,13 +3373,7 @@ def main():
                     # Check if clicking on a switch to toggle it
                     comp_info = get_component_at(gp)
                     if comp_info and comp_info[0] == 'switch' and tool != "ERASE":
-                        sw = comp_info[1]
-                        sw.closed = not sw.closed
-                        # Auto-run if already solved once
-                        if solved or len(pointV) > 0:
-                            solve_now()
-                        else:
-                            solved = False
+                        toggle_switch(comp_info[1])
                         continue
 
                     if tool == "WIRE":
@@ -666,33 +3418,43 @@ def main():
                         dx, dy = ORIENTATIONS[current_orientation]
                         b_pos = (gp[0] + dx, gp[1] + dy)
                         if in_bounds(b_pos):
-                            resistors.append(Resistor(gp, b_pos, DEFAULT_R, next_r))
-                            next_r += 1
-                            solved = False
+                            parts.add("resistor", resistors.add(gp, b_pos, DEFAULT_R))
+                            circuit_edited()
 
                     elif tool == "BAT":
                         dx, dy = ORIENTATIONS[current_orientation]
                         minus_pos = (gp[0] + dx, gp[1] + dy)
                         if in_bounds(minus_pos):
-                            batteries.append(Battery(gp, minus_pos, DEFAULT_V, next_b))
-                            next_b += 1
-                            solved = False
+                            parts.add("battery", batteries.add(gp, minus_pos, DEFAULT_V))
+                            circuit_edited()
 
                     elif tool == "BULB":
                         dx, dy = ORIENTATIONS[current_orientation]
                         b_pos = (gp[0] + dx, gp[1] + dy)
                         if in_bounds(b_pos):
-                            lightbulbs.append(Lightbulb(gp, b_pos, DEFAULT_BULB_R, next_lb))
-                            next_lb += 1
-                            solved = False
+                            parts.add("lightbulb", lightbulbs.add(gp, b_pos, DEFAULT_BULB_R))
+                            circuit_edited()
 
                     elif tool == "SWITCH":
                         dx, dy = ORIENTATIONS[current_orientation]
                         b_pos = (gp[0] + dx, gp[1] + dy)
                         if in_bounds(b_pos):
-                            switches.append(Switch(gp, b_pos, next_sw))
-                            next_sw += 1
-                            solved = False
+                            parts.add("switch", switches.add(gp, b_pos, True))
+                            circuit_edited()
+
+                    elif tool == "CAP":
+                        dx, dy = ORIENTATIONS[current_orientation]
+                        b_pos = (gp[0] + dx, gp[1] + dy)
+                        if in_bounds(b_pos):
+                            parts.add("capacitor", capacitors.add(gp, b_pos, DEFAULT_C))
+                            circuit_edited()
+
+                    elif tool == "IND":
+                        dx, dy = ORIENTATIONS[current_orientation]
+                        b_pos = (gp[0] + dx, gp[1] + dy)
+                        if in_bounds(b_pos):
+                            parts.add("inductor", inductors.add(gp, b_pos, DEFAULT_L))
+                            circuit_edited()
 
                     elif tool == "ERASE":
                         erase_at(gp)
@@ -707,19 +3469,34 @@ def main():
                 if dragging_wire and tool == "WIRE":
                     dragging_wire = False
                     if wire_start is not None and wire_end is not None:
-                        add_wire_path(wire_start, wire_end)
+                        add_wire_path(dragged_path())
                     wire_start = None
                     wire_end = None
-                    solved = False
+                    circuit_edited()
+
+        profiler.timer.mark("events")
+
+        # Advance the transient simulation
+        if transient is not None and not input_dialog:
+            for _ in range(TRANSIENT_STEPS_PER_FRAME):
+                transient.step()
+            pointV = transient.point_voltages(voltage_probes)
+            layer_dirty = True
+        profiler.timer.mark("transient")
 
         # Update ghost component
-        if tool in ("RES", "BAT", "BULB", "SWITCH") and mouse_grid and in_bounds(mouse_grid) and not input_dialog:
+        if tool in ("RES", "BAT", "BULB", "SWITCH", "CAP", "IND") and mouse_grid and in_bounds(mouse_grid) and not input_dialog:
             ghost_component = (tool, mouse_grid, current_orientation)
         else:
             ghost_component = None
 
         # Draw
-        screen.fill((250, 250, 250))
+        if layer_dirty:
+            circuit_layer.blit(grid_layer, (0, 0))
+            burning = draw_circuit(circuit_layer)
+            layer_dirty = False
+        screen.blit(circuit_layer, (0, 0))
+        profiler.timer.mark("circuit")
 
         # Panel
         pygame.draw.rect(screen, (245, 245, 245), (0, 0, PANEL_W, H))
@@ -735,7 +3512,7 @@ def main():
         # Info
         info = [
             "Click to place components",
-            "Click-drag to draw wires",
+            "Click-drag to draw wires (Shift: L)",
             "Scroll to rotate before placing",
             "Right-click to edit values",
             "V: probe voltage at nodes",
@@ -751,28 +3528,16 @@ def main():
             for line in last_error.splitlines():
                 screen.blit(tiny.render(line, True, (140, 40, 40)), (20, y))
                 y += 16
+        profiler.timer.mark("panel")
 
-        # Grid
-        gx_min, gx_max = -5, int((W - PANEL_W - 2 * GRID_MARGIN) / GRID_SPACING) + 5
-        gy_min, gy_max = -2, int((H - 2 * GRID_MARGIN) / GRID_SPACING) + 2
-
-        for gx in range(gx_min, gx_max + 1):
-            for gy in range(gy_min, gy_max + 1):
-                p = (gx, gy)
-                if not in_bounds(p):
-                    continue
-                x, y = mouse_from_grid(p)
-                pygame.draw.circle(screen, (220, 220, 220), (int(x), int(y)), NODE_RADIUS)
-
-        # Wires
-        for (a, b) in wires:
+        # Current probes
+        for edge in current_probes:
+            if edge not in wires:
+                continue
+            a, b = edge
             x1, y1 = mouse_from_grid(a)
             x2, y2 = mouse_from_grid(b)
-            pygame.draw.line(screen, (20, 20, 20), (x1, y1), (x2, y2), WIRE_WIDTH)
-            
-            # Draw current arrow only if this wire has a current probe
-            edge = norm_edge(a, b)
-            if solved and edge in current_probes and edge in wireI:
+            if solved and edge in wireI:
                 current = wireI[edge]
                 if abs(current) > 0.001:
                     mx, my = (x1 + x2) / 2, (y1 + y2) / 2
@@ -822,9 +3587,14 @@ def main():
                 pygame.draw.circle(screen, (200, 100, 200), (int(mx), int(my)), 6)
                 pygame.draw.circle(screen, (150, 50, 150), (int(mx), int(my)), 6, 2)
 
+        # Points blamed by the last error
+        for p in error_points[:200]:
+            x, y = mouse_from_grid(p)
+            pygame.draw.circle(screen, (220, 40, 40), (int(x), int(y)), 9, 2)
+
         # Ghost wire
         if dragging_wire and wire_start and wire_end:
-            path = manhattan_path(wire_start, wire_end)
+            path = dragged_path()
             for i in range(len(path) - 1):
                 a, b = path[i], path[i + 1]
                 if not in_bounds(a) or not in_bounds(b):
@@ -833,173 +3603,10 @@ def main():
                 x2, y2 = mouse_from_grid(b)
                 pygame.draw.line(screen, (80, 160, 255), (x1, y1), (x2, y2), WIRE_WIDTH)
 
-        # Components
-        def draw_line(p0, p1, color, width):
-            x1, y1 = mouse_from_grid(p0)
-            x2, y2 = mouse_from_grid(p1)
-            pygame.draw.line(screen, color, (x1, y1), (x2, y2), width)
-
-        for r in resistors:
-            draw_line(r.a, r.b, (70, 70, 70), 7)
-            mx = (mouse_from_grid(r.a)[0] + mouse_from_grid(r.b)[0]) / 2
-            my = (mouse_from_grid(r.a)[1] + mouse_from_grid(r.b)[1]) / 2
-            label = f"{r.ohms:g}Ω"
-            if solved and r.id in rI:
-                label += f" {r.power:.2f}W"
-            screen.blit(tiny.render(label, True, (10, 10, 10)), (mx + 8, my - 18))
-
-        for b in batteries:
-            draw_line(b.plus, b.minus, (40, 40, 40), 8)
-            xP, yP = mouse_from_grid(b.plus)
-            xM, yM = mouse_from_grid(b.minus)
-            pygame.draw.circle(screen, (200, 50, 50), (int(xP), int(yP)), 8)
-            pygame.draw.circle(screen, (50, 50, 200), (int(xM), int(yM)), 8)
-            screen.blit(tiny.render("+", True, (255, 255, 255)), (xP - 4, yP - 8))
-            screen.blit(tiny.render("-", True, (255, 255, 255)), (xM - 5, yM - 8))
-
-            mx = (xP + xM) / 2
-            my = (yP + yM) / 2
-            label = f"{b.volts:g}V"
-            if solved and b.id in bI:
-                label += f" {bI[b.id]:.3g}A"
-            screen.blit(tiny.render(label, True, (10, 10, 10)), (mx + 8, my - 18))
-
-        for lb in lightbulbs:
-            x1, y1 = mouse_from_grid(lb.a)
-            x2, y2 = mouse_from_grid(lb.b)
-            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
-            
-            # Draw connection lines
-            pygame.draw.line(screen, (60, 60, 60), (x1, y1), (mx, my), 4)
-            pygame.draw.line(screen, (60, 60, 60), (mx, my), (x2, y2), 4)
-            
-            # Draw bulb shape - realistic bulb
-            bulb_radius = 18
-            
-            # Glass bulb (circle)
-            if solved and lb.on_fire:
-                # FIRE! Draw animated fire effect
-                import random
-                fire_colors = [
-                    (255, 69, 0),   # Red-orange
-                    (255, 140, 0),  # Dark orange
-                    (255, 215, 0),  # Gold
-                    (255, 69, 0),   # Red-orange
-                ]
-                # Draw multiple flame particles
-                for _ in range(8):
-                    offset_x = random.randint(-8, 8)
-                    offset_y = random.randint(-12, -2)
-                    flame_size = random.randint(4, 10)
-                    color = random.choice(fire_colors)
-                    flame_x = int(mx + offset_x)
-                    flame_y = int(my + offset_y)
-                    pygame.draw.circle(screen, color, (flame_x, flame_y), flame_size)
-                
-                # Draw smoke
-                smoke_color = (80, 80, 80)
-                for i in range(3):
-                    smoke_y = int(my - 15 - i * 8)
-                    smoke_size = 5 + i * 2
-                    pygame.draw.circle(screen, smoke_color, (int(mx), smoke_y), smoke_size)
-                
-                # Blackened bulb
-                pygame.draw.circle(screen, (40, 40, 40), (int(mx), int(my)), bulb_radius)
-                pygame.draw.circle(screen, (20, 20, 20), (int(mx), int(my)), bulb_radius, 3)
-                
-            elif solved:
-                # Normal bulb with brightness
-                brightness = int(255 * lb.brightness)
-                # Bulb glows yellow when lit
-                glow_color = (brightness, brightness, min(100 + int(brightness * 0.7), 255))
-                inner_glow = max(0, brightness - 50)
-                
-                # Outer glow effect
-                if brightness > 50:
-                    for r in range(bulb_radius + 8, bulb_radius, -2):
-                        alpha_glow = int((brightness / 255) * 30)
-                        glow_surf = pygame.Surface((r*2, r*2), pygame.SRCALPHA)
-                        pygame.draw.circle(glow_surf, (*glow_color, alpha_glow), (r, r), r)
-                        screen.blit(glow_surf, (int(mx - r), int(my - r)))
-                
-                # Glass bulb
-                pygame.draw.circle(screen, glow_color, (int(mx), int(my)), bulb_radius)
-                
-                # Filament (brighter center)
-                if brightness > 20:
-                    filament_color = (255, 255, min(255, 150 + inner_glow))
-                    pygame.draw.circle(screen, filament_color, (int(mx), int(my)), int(bulb_radius * 0.4))
-                
-                # Glass outline
-                pygame.draw.circle(screen, (120, 120, 120), (int(mx), int(my)), bulb_radius, 2)
-            else:
-                # Unlit bulb
-                pygame.draw.circle(screen, (200, 200, 200), (int(mx), int(my)), bulb_radius)
-                pygame.draw.circle(screen, (100, 100, 100), (int(mx), int(my)), bulb_radius, 2)
-                # Filament visible when off
-                pygame.draw.line(screen, (80, 80, 80), 
-                               (int(mx - 6), int(my - 3)), 
-                               (int(mx + 6), int(my + 3)), 2)
-            
-            # Screw base
-            base_rect = pygame.Rect(int(mx - 6), int(my + bulb_radius - 5), 12, 8)
-            pygame.draw.rect(screen, (150, 150, 150), base_rect)
-            pygame.draw.line(screen, (100, 100, 100), 
-                           (base_rect.left, base_rect.top + 3),
-                           (base_rect.right, base_rect.top + 3), 1)
-            pygame.draw.line(screen, (100, 100, 100), 
-                           (base_rect.left, base_rect.top + 6),
-                           (base_rect.right, base_rect.top + 6), 1)
-            
-            # Label
-            label = f"{lb.ohms:g}Ω"
-            if solved:
-                if lb.on_fire:
-                    label += " 🔥 OVERLOAD!"
-                    label_color = (255, 0, 0)
-                else:
-                    label += f" {lb.power:.2f}W"
-                    label_color = (10, 10, 10)
-            else:
-                label_color = (10, 10, 10)
-            screen.blit(tiny.render(label, True, label_color), (mx + 24, my - 18))
-
-        # Draw switches
-        for sw in switches:
-            x1, y1 = mouse_from_grid(sw.a)
-            x2, y2 = mouse_from_grid(sw.b)
-            mx, my = (x1 + x2) / 2, (y1 + y2) / 2
-            
-            # Draw terminals
-            pygame.draw.circle(screen, (100, 100, 100), (int(x1), int(y1)), 6)
-            pygame.draw.circle(screen, (100, 100, 100), (int(x2), int(y2)), 6)
-            
-            if sw.closed:
-                # Closed switch - straight line
-                pygame.draw.line(screen, (50, 150, 50), (x1, y1), (x2, y2), 5)
-                status = "CLOSED"
-                status_color = (0, 150, 0)
-            else:
-                # Open switch - angled line to show it's open
-                dx, dy = x2 - x1, y2 - y1
-                length = math.sqrt(dx*dx + dy*dy)
-                if length > 0:
-                    # Draw line from a to midpoint, then angled up
-                    mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
-                    # Perpendicular offset
-                    perp_x, perp_y = -dy / length, dx / length
-                    open_x = mid_x + perp_x * 15
-                    open_y = mid_y + perp_y * 15
-                    
-                    pygame.draw.line(screen, (200, 50, 50), (x1, y1), (open_x, open_y), 5)
-                    pygame.draw.line(screen, (200, 50, 50), (open_x, open_y), (x2, y2), 5)
-                status = "OPEN"
-                status_color = (200, 0, 0)
-            
-            # Label
-            label = f"SW{sw.id} {status}"
-            screen.blit(tiny.render(label, True, status_color), (mx + 8, my - 25))
-            screen.blit(tiny.render("(click to toggle)", True, (100, 100, 100)), (mx + 8, my - 10))
+        profiler.timer.mark("overlay")
+        for mx, my in burning:
+            draw_fire(mx, my)
+        profiler.timer.mark("fire")
 
         # Ghost component
         if ghost_component:
@@ -1008,9 +3615,9 @@ def main():
             b_pos = (gp[0] + dx, gp[1] + dy)
             if in_bounds(b_pos):
                 if comp_type == "RES":
-                    draw_line(gp, b_pos, (150, 150, 255), 5)
+                    draw_line(screen, gp, b_pos, (150, 150, 255), 5)
                 elif comp_type == "BAT":
-                    draw_line(gp, b_pos, (150, 150, 255), 6)
+                    draw_line(screen, gp, b_pos, (150, 150, 255), 6)
                     xP, yP = mouse_from_grid(gp)
                     pygame.draw.circle(screen, (200, 150, 255), (int(xP), int(yP)), 6)
                 elif comp_type == "BULB":
@@ -1024,6 +3631,12 @@ def main():
                     x1, y1 = mouse_from_grid(gp)
                     x2, y2 = mouse_from_grid(b_pos)
                     pygame.draw.line(screen, (150, 150, 255), (x1, y1), (x2, y2), 4)
+                elif comp_type in ("CAP", "IND"):
+                    x1, y1 = mouse_from_grid(gp)
+                    x2, y2 = mouse_from_grid(b_pos)
+                    mx, my = (x1 + x2) / 2, (y1 + y2) / 2
+                    pygame.draw.line(screen, (150, 150, 255), (x1, y1), (x2, y2), 3)
+                    pygame.draw.circle(screen, (200, 200, 255), (int(mx), int(my)), 8, 2)
 
         # Show voltage probes
         if solved:
@@ -1055,31 +3668,20 @@ def main():
                     pygame.draw.circle(screen, (200, 200, 200), (int(x), int(y)), 8)
                     pygame.draw.circle(screen, (150, 150, 150), (int(x), int(y)), 8, 2)
 
-        # Draw watermark in center of canvas
-        # Try cursive fonts, fallback to italic
-        available_fonts = pygame.font.get_fonts()
-        cursive_fonts = ['brushscriptmt', 'brushscript', 'lucidahandwriting', 'zapfchancery', 'mistral']
-        
-        watermark_font = None
-        for font_name in cursive_fonts:
-            if font_name in available_fonts:
-                try:
-                    watermark_font = pygame.font.SysFont(font_name, 72)
-                    break
-                except:
-                    continue
-        
-        if watermark_font is None:
-            # Fallback to italic
-            watermark_font = pygame.font.SysFont("Arial", 60, italic=True)
-        
-        watermark_text = "Ganeev's Circuit Sim"
-        watermark_surf = watermark_font.render(watermark_text, True, (180, 180, 180))
-        watermark_surf.set_alpha(120)  # More visible but still faded
-        watermark_x = PANEL_W + (W - PANEL_W - watermark_surf.get_width()) // 2
-        watermark_y = (H - watermark_surf.get_height()) // 2
         screen.blit(watermark_surf, (watermark_x, watermark_y))
 
+        if notice:
+            screen.blit(tiny.render(notice, True, (40, 110, 40)), (PANEL_W + 12, H - 24))
+
+        if transient is not None:
+            label = f"Transient t = {transient.t:.2f} s  [T to stop]"
+            screen.blit(tiny.render(label, True, (20, 90, 160)), (PANEL_W + 12, 8))
+        elif solving:
+            screen.blit(tiny.render("Solving...", True, (20, 90, 160)), (PANEL_W + 12, 8))
+
+        if profiler.on:
+            draw_profiler()
+
         # Draw input dialog on top
         if input_dialog:
             # Semi-transparent overlay
@@ -1088,9 +3690,63 @@ def main():
             overlay.fill((0, 0, 0))
             screen.blit(overlay, (0, 0))
             input_dialog.draw(screen, font)
+        profiler.timer.mark("overlay")
 
         pygame.display.flip()
+        profiler.timer.mark("flip")
         clock.tick(60)
+        profiler.timer.mark("wait")
+        profiler.end_frame()
+
+# Headless entry point: python -m circuitsim solve <netlist or directory>
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="circuitsim", description="Headless circuit solver")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_solve = sub.add_parser("solve", help="solve JSON/NPZ netlists with solve_dc")
+    p_solve.add_argument("path", help="netlist file (.json, .npz, .circ) or a directory of netlists")
+    p_solve.add_argument("-o", "--output", help="output file (or directory when solving a directory)")
+    p_solve.add_argument("-f", "--format", choices=("json", "npz"), default="json")
+    p_solve.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for directories")
+
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.path):
+        out_dir = args.output or args.path
+        os.makedirs(out_dir, exist_ok=True)
+        jobs = []
+        for name in sorted(os.listdir(args.path)):
+            stem, ext = os.path.splitext(name)
+            if ext not in (".json", ".npz", ".circ") or stem.endswith(".result"):
+                continue
+            dst = os.path.join(out_dir, stem + ".result." + args.format)
+            jobs.append((os.path.join(args.path, name), dst, args.format))
+        failed = 0
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for src, dst, err in pool.map(solve_netlist_file, jobs, chunksize=4):
+                if err:
+                    failed += 1
+                    print(f"{src}: {err.splitlines()[0]}", file=sys.stderr)
+                else:
+                    print(f"{src} -> {dst}")
+        print(f"{len(jobs) - failed}/{len(jobs)} netlists solved")
+        return 1 if failed else 0
+
+    try:
+        results = solve_dc(*load_netlist(args.path))
+    except (ValueError, OSError, KeyError) as e:
+        print(f"{args.path}: {e}", file=sys.stderr)
+        return 1
+    if args.output:
+        write_results(args.output, results, args.format)
+    elif args.format == "json":
+        json.dump(results_to_dict(results), sys.stdout, indent=1)
+        print()
+    else:
+        parser.error("--format npz needs --output")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark for the circuit simulator's DC solver (circuitsim.solve_dc)
+
+Builds synthetic boards of a given number of nodes and times the phases of
+solve_dc separately:
+- merge: collecting grid points, merging wired nodes (DSU) and the island check
+- stamp: numbering nodes and stamping the MNA triplets
+- solve: the (Newton) linear solve
+- post:  node/branch currents and the KCL wire-current pass
+
+Boards:
+- ladder:   resistor ladder, a chain of series resistors with rungs
+- mesh:     square resistor mesh with a lightbulb every tenth edge
+- switches: random board of resistors, wires, bulbs and open/closed switches
+
+Usage:
+- python circuitsim_bench.py                          (all boards, 10 .. 100k nodes)
+- python circuitsim_bench.py -b mesh -s 1000 10000 -r 5 -o report.json
+- python circuitsim_bench.py -o new.json --compare old.json   (per-phase ratios)
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+
+import numpy as np
+
+import circuitsim as cs
+
+PHASES = ("merge", "stamp", "solve", "post")
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+
+# Every board is fed through a 1 ohm resistor so random wiring can't short the battery
+def feed(resistors, batteries, plus, minus, volts=9.0):
+    batteries.append(cs.Battery((plus[0] - 1, plus[1]), minus, volts, len(batteries)))
+    resistors.append(cs.Resistor((plus[0] - 1, plus[1]), plus, 1.0, len(resistors)))
+
+# Top rail of series resistors, a rung resistor down to a wired bottom rail per step
+def ladder_board(nodes, seed=0):
+    rnd = random.Random(seed)
+    wires, resistors, batteries = set(), [], []
+    steps = max(1, nodes - 1)
+    for k in range(steps):
+        resistors.append(cs.Resistor((k, 0), (k + 1, 0), rnd.uniform(10, 1000), len(resistors)))
+        resistors.append(cs.Resistor((k + 1, 0), (k + 1, 1), rnd.uniform(10, 1000), len(resistors)))
+        wires.add(cs.norm_edge((k, 1), (k + 1, 1)))
+    feed(resistors, batteries, (0, 0), (0, 1))
+    return wires, resistors, batteries, [], []
+
+def mesh_board(nodes, seed=0):
+    rnd = random.Random(seed)
+    side = max(2, int(round(math.sqrt(nodes))))
+    resistors, lightbulbs, batteries = [], [], []
+    k = 0
+    for x in range(side):
+        for y in range(side):
+            for q in ((x + 1, y), (x, y + 1)):
+                if q[0] >= side or q[1] >= side:
+                    continue
+                if k % 10 == 9:
+                    lightbulbs.append(cs.Lightbulb((x, y), q, rnd.uniform(10, 100), len(lightbulbs)))
+                else:
+                    resistors.append(cs.Resistor((x, y), q, rnd.uniform(10, 1000), len(resistors)))
+                k += 1
+    feed(resistors, batteries, (0, 0), (side - 1, side - 1))
+    return set(), resistors, batteries, lightbulbs, []
+
+# Each switch gets a 1 Mohm resistor in parallel so an open one never leaves a node floating
+def switch_board(nodes, seed=0):
+    rnd = random.Random(seed)
+    side = max(2, int(round(math.sqrt(nodes))))
+    wires, resistors, batteries, lightbulbs, switches = set(), [], [], [], []
+    for x in range(side):
+        for y in range(side):
+            for q in ((x + 1, y), (x, y + 1)):
+                if q[0] >= side or q[1] >= side:
+                    continue
+                k = rnd.random()
+                if k < 0.4:
+                    resistors.append(cs.Resistor((x, y), q, rnd.uniform(10, 1000), len(resistors)))
+                elif k < 0.7:
+                    sw = cs.Switch((x, y), q, len(switches))
+                    sw.closed = rnd.random() < 0.5
+                    switches.append(sw)
+                    resistors.append(cs.Resistor((x, y), q, 1e6, len(resistors)))
+                elif k < 0.9:
+                    wires.add(cs.norm_edge((x, y), q))
+                else:
+                    lightbulbs.append(cs.Lightbulb((x, y), q, rnd.uniform(10, 100), len(lightbulbs)))
+    feed(resistors, batteries, (0, 0), (side - 1, side - 1))
+    return wires, resistors, batteries, lightbulbs, switches
+
+BOARDS = {"ladder": ladder_board, "mesh": mesh_board, "switches": switch_board}
+
+# Best of `repeat` runs for every phase
+def bench_board(board, nodes, repeat=3, seed=0):
+    circuit = BOARDS[board](nodes, seed)
+    best = {}
+    for _ in range(repeat):
+        timings = {}
+        results = cs.solve_dc(*circuit, timings=timings)
+        for phase in PHASES:
+            best[phase] = min(best.get(phase, math.inf), timings.get(phase, 0.0))
+    wires, resistors, batteries, lightbulbs, switches = circuit
+    _, _, rows, cols, _, z, _ = cs.dc_system(*circuit)
+    return {
+        "board": board,
+        "target_nodes": nodes,
+        "nodes": len(results[0]),
+        "parts": len(wires) + len(resistors) + len(batteries) + len(lightbulbs) + len(switches),
+        "sparse": cs.MNAPattern(len(z), rows, cols).sparse,
+        "phases": best,
+        "total": sum(best.values()),
+    }
+
+def run(boards, sizes, repeat=3, seed=0, out=sys.stdout):
+    rows = []
+    print(f"{'board':<9} {'nodes':>7} " + " ".join(f"{p:>9}" for p in PHASES) + f" {'total':>9}", file=out)
+    for board in boards:
+        for nodes in sizes:
+            row = bench_board(board, nodes, repeat, seed)
+            rows.append(row)
+            print(f"{board:<9} {row['nodes']:>7} "
+                  + " ".join(f"{row['phases'][p] * 1e3:>7.2f}ms" for p in PHASES)
+                  + f" {row['total'] * 1e3:>7.2f}ms", file=out)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": None if cs.sp is None else __import__("scipy").__version__,
+        "repeat": repeat,
+        "seed": seed,
+        "results": rows,
+    }
+
+# Print new/old time ratios per phase for the (board, target_nodes) pairs both reports have
+def compare(report, baseline, out=sys.stdout):
+    old = {(r["board"], r["target_nodes"]): r for r in baseline["results"]}
+    print(f"{'board':<9} {'nodes':>7} " + " ".join(f"{p:>7}" for p in PHASES) + f" {'total':>7}", file=out)
+    for row in report["results"]:
+        prev = old.get((row["board"], row["target_nodes"]))
+        if prev is None:
+            continue
+        def ratio(new, was):
+            return f"{new / was:>6.2f}x" if was > 0 else f"{'-':>7}"
+        print(f"{row['board']:<9} {row['nodes']:>7} "
+              + " ".join(ratio(row["phases"][p], prev["phases"].get(p, 0.0)) for p in PHASES)
+              + " " + ratio(row["total"], prev["total"]), file=out)
+
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="circuitsim_bench", description="Benchmark circuitsim.solve_dc")
+    parser.add_argument("-b", "--boards", nargs="+", choices=sorted(BOARDS), default=list(BOARDS))
+    parser.add_argument("-s", "--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="target node counts")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per board, the best one counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args.boards, args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        compare(report, baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(cli(sys.argv[1:]))
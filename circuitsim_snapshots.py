@@ -0,0 +1,262 @@
+"""
+Snapshot regression harness for the circuit simulator's DC results
+
+A library of reference boards (.circ files) lives in a snapshot directory
+next to one golden NPZ per board: the solve_dc results of that board
+(circuitsim.results_to_arrays) plus the baseline seconds of every solver
+path. Checking runs every board through each path and compares voltages
+and currents to the golden within tolerance, and the timings to the
+baseline, so a faster path can't quietly become a wrong one (or the other
+way round). Only the solve itself is timed: loading the board, and the
+factorization or cache miss a path solves against, happen before the clock
+starts.
+
+Solver paths:
+- solve_dc:    solve_dc as it is
+- dense:       every system through the dense solver
+- sparse:      every system through splu (needs scipy)
+- incremental: IncrementalSolver, factored with some switches flipped and
+               solved back in the saved state by a Woodbury update (timed);
+               fails if it falls back to solve_dc
+- cached:      a SolveCache hit (timed, after the miss that filled it), with
+               the part state restored from it
+- tables:      the parts as PartTables (PartStore) instead of objects
+
+Usage:
+- python circuitsim_snapshots.py --update          (write missing boards and goldens)
+- python circuitsim_snapshots.py                   (check every board on every path)
+- python circuitsim_snapshots.py -p sparse cached --max-slowdown 2
+- python circuitsim_snapshots.py --update --timings-only   (new speed baseline for every golden)
+"""
+
+import os
+import sys
+import time
+import math
+import argparse
+
+import numpy as np
+
+import circuitsim as cs
+import circuitsim_bench as bench
+
+SNAPSHOT_DIR = "snapshots"
+PATHS = ("solve_dc", "dense", "sparse", "incremental", "cached", "tables")
+RESULT_KEYS = ("point_voltage", "resistor_current", "battery_current", "lightbulb_current", "wire_current")
+
+# Default tolerance on voltages and currents: |new - golden| <= ATOL + RTOL * |golden|
+RTOL = 1e-7
+ATOL = 1e-10
+
+# Two islands, each with its own battery, bulbs and a closed and an open switch
+def islands_board():
+    wires = {cs.norm_edge((0, 0), (0, 1)), cs.norm_edge((0, 1), (0, 2)), cs.norm_edge((10, 0), (10, 2))}
+    resistors = [cs.Resistor((2, 0), (4, 0), 220.0, 0), cs.Resistor((12, 0), (12, 2), 47.0, 1)]
+    batteries = [cs.Battery((0, 0), (2, 0), 9.0, 0), cs.Battery((10, 0), (12, 0), 4.5, 1)]
+    lightbulbs = [cs.Lightbulb((4, 0), (4, 2), 30.0, 0), cs.Lightbulb((0, 2), (2, 2), 60.0, 1)]
+    switches = [cs.Switch((2, 2), (4, 2), 0), cs.Switch((0, 2), (0, 4), 1)]
+    resistors.append(cs.Resistor((0, 4), (4, 2), 1000.0, 2))
+    return wires, resistors, batteries, lightbulbs, switches, [], []
+
+# An RLC board as the DC solver sees it: inductors short, capacitors open
+def rlc_board():
+    wires = {cs.norm_edge((6, 0), (6, 1)), cs.norm_edge((6, 1), (6, 2))}
+    resistors = [cs.Resistor((2, 0), (4, 0), 100.0, 0), cs.Resistor((6, 2), (4, 2), 330.0, 1)]
+    batteries = [cs.Battery((0, 0), (2, 0), 12.0, 0)]
+    lightbulbs = [cs.Lightbulb((2, 2), (0, 2), 50.0, 0)]
+    capacitors = [cs.Capacitor((2, 0), (2, 2), 0.01, 0)]
+    inductors = [cs.Inductor((4, 0), (6, 0), 10.0, 0), cs.Inductor((4, 2), (2, 2), 1.0, 1)]
+    wires.add(cs.norm_edge((0, 0), (0, 1)))
+    wires.add(cs.norm_edge((0, 1), (0, 2)))
+    return wires, resistors, batteries, lightbulbs, [], capacitors, inductors
+
+# name -> circuit builder; the bench boards cover dense and sparse sizes
+def reference_boards():
+    boards = {"islands": islands_board, "rlc": rlc_board}
+    for board in sorted(bench.BOARDS):
+        for nodes in (10, 100, 1000):
+            boards[f"{board}_{nodes}"] = (lambda b, k: lambda: bench.BOARDS[b](k, seed=7) + ([], []))(board, nodes)
+    return boards
+
+def board_path(directory, name):
+    return os.path.join(directory, name + ".circ")
+
+def golden_path(directory, name):
+    return os.path.join(directory, name + ".golden.npz")
+
+def library(directory):
+    return sorted(f[:-len(".circ")] for f in os.listdir(directory) if f.endswith(".circ"))
+
+# solve_dc with every system on one side of SPARSE_MIN_SIZE
+def solve_with_min_size(circuit, min_size):
+    saved = cs.SPARSE_MIN_SIZE
+    cs.SPARSE_MIN_SIZE = min_size
+    try:
+        return cs.solve_dc(*circuit)
+    finally:
+        cs.SPARSE_MIN_SIZE = saved
+
+# An IncrementalSolver factored with some switches flipped, the switches put back
+def incremental_solver(circuit):
+    switches = circuit[4]
+    flipped = list(switches)[:4]
+    for sw in flipped:
+        sw.closed = not sw.closed
+    engine = cs.IncrementalSolver(*circuit)
+    try:
+        engine.solve()
+    except ValueError:
+        pass  # the flipped state may not be solvable, the saved one still is
+    for sw in flipped:
+        sw.closed = not sw.closed
+    return engine
+
+# engine.solve() that fails when the solve was not the fast path
+def fast_solve(engine):
+    fallbacks = engine.fallbacks
+    results = engine.solve()
+    if engine.fallbacks != fallbacks:
+        raise ValueError("IncrementalSolver fell back to solve_dc")
+    return results
+
+# A SolveCache that already holds the circuit
+def filled_cache(circuit):
+    cache = cs.SolveCache()
+    cache.solve(*circuit)
+    return cache
+
+# Load one board for one path and do everything the path needs before its
+# solve; returns the solve as a function of no arguments. The circuit is
+# loaded fresh every time, so no path sees state a previous one left on the
+# parts.
+def prepare(path, circ):
+    if path == "tables":
+        circuit = cs.PartStore.load(circ).parts()
+        return lambda: cs.solve_dc(*circuit)
+    circuit = cs.load_circuit(circ)
+    if path == "solve_dc":
+        return lambda: cs.solve_dc(*circuit)
+    if path == "dense":
+        return lambda: solve_with_min_size(circuit, math.inf)
+    if path == "sparse":
+        return lambda: solve_with_min_size(circuit, 0)
+    if path == "incremental":
+        engine = incremental_solver(circuit)
+        return lambda: fast_solve(engine)
+    if path == "cached":
+        cache = filled_cache(circuit)
+        return lambda: cache.solve(*circuit)
+    raise ValueError(f"Unknown solver path {path!r}")
+
+def solve_path(path, circ):
+    return prepare(path, circ)()
+
+def available_paths(paths):
+    return [p for p in paths if p != "sparse" or cs.sp is not None]
+
+# Best of `repeat` runs of the solve alone; returns (results of the last run, seconds)
+def timed(path, circ, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        solve = prepare(path, circ)
+        t = time.perf_counter()
+        results = solve()
+        best = min(best, time.perf_counter() - t)
+    return results, best
+
+# Largest violation of |new - golden| <= atol + rtol * |golden| per result
+# table (0 = within tolerance), or inf when the rows don't match up
+def compare_results(arrays, golden, rtol=RTOL, atol=ATOL):
+    errors = {}
+    for key in RESULT_KEYS:
+        new, old = arrays[key], golden[key]
+        if new.shape != old.shape or not np.array_equal(new[:, :-1], old[:, :-1]):
+            errors[key] = math.inf
+            continue
+        excess = np.abs(new[:, -1] - old[:, -1]) - (atol + rtol * np.abs(old[:, -1]))
+        errors[key] = float(max(0.0, excess.max(initial=0.0)))
+    if not np.array_equal(arrays["ground"], golden["ground"]):
+        errors["ground"] = math.inf
+    return errors
+
+def update(directory, paths, repeat=3, timings_only=False, out=sys.stdout):
+    os.makedirs(directory, exist_ok=True)
+    for name, build in reference_boards().items():
+        circ = board_path(directory, name)
+        if not os.path.exists(circ):
+            cs.save_circuit(circ, *build())
+    for name in library(directory):
+        circ = board_path(directory, name)
+        gold = golden_path(directory, name)
+        exists = os.path.exists(gold)
+        if exists and not timings_only:
+            continue
+        if exists:
+            with np.load(gold) as f:
+                arrays = {key: f[key] for key in f.files if not key.startswith("seconds_")}
+        else:
+            arrays = cs.results_to_arrays(solve_path("solve_dc", circ))
+        for path in paths:
+            arrays["seconds_" + path] = np.array(timed(path, circ, repeat)[1])
+        np.savez(gold, **arrays)
+        print(f"{name:<16} {'timings' if exists else 'golden'} written", file=out)
+
+# Returns the number of failed (board, path) checks
+def check(directory, paths, repeat=3, rtol=RTOL, atol=ATOL, max_slowdown=None, out=sys.stdout):
+    failures = 0
+    print(f"{'board':<16} {'path':<12} {'over tol':>10} {'time':>10} {'baseline':>10} {'ratio':>7}  result", file=out)
+    for name in library(directory):
+        gold = golden_path(directory, name)
+        if not os.path.exists(gold):
+            print(f"{name:<16} {'-':<12} no golden, run with --update", file=out)
+            failures += 1
+            continue
+        with np.load(gold) as f:
+            golden = {key: f[key] for key in f.files}
+        for path in paths:
+            try:
+                results, seconds = timed(path, board_path(directory, name), repeat)
+            except ValueError as e:
+                print(f"{name:<16} {path:<12} FAIL {str(e).splitlines()[0]}", file=out)
+                failures += 1
+                continue
+            errors = compare_results(cs.results_to_arrays(results), golden, rtol, atol)
+            worst = max(errors.values())
+            base = float(golden.get("seconds_" + path, np.nan))
+            ratio = seconds / base if base > 0 else math.nan
+            status = "ok"
+            if worst > 0:
+                status = "FAIL " + ", ".join(k for k, v in errors.items() if v > 0)
+            elif max_slowdown is not None and ratio > max_slowdown:
+                status = "SLOW"
+            if status != "ok":
+                failures += 1
+            print(f"{name:<16} {path:<12} {worst:>10.2e} {seconds * 1e3:>8.2f}ms {base * 1e3:>8.2f}ms "
+                  f"{ratio:>6.2f}x  {status}", file=out)
+    return failures
+
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="circuitsim_snapshots",
+                                     description="Check circuitsim results and speed against golden snapshots")
+    parser.add_argument("-d", "--directory", default=SNAPSHOT_DIR, help="snapshot library directory")
+    parser.add_argument("-p", "--paths", nargs="+", choices=PATHS, default=list(PATHS), help="solver paths to run")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per board and path, the best one counts")
+    parser.add_argument("--rtol", type=float, default=RTOL)
+    parser.add_argument("--atol", type=float, default=ATOL)
+    parser.add_argument("--max-slowdown", type=float, help="fail paths slower than this times their baseline")
+    parser.add_argument("--update", action="store_true", help="write missing boards, goldens and timings")
+    parser.add_argument("--timings-only", action="store_true", help="with --update, rewrite the timings of every golden")
+    args = parser.parse_args(argv)
+
+    paths = available_paths(args.paths)
+    if args.update:
+        update(args.directory, paths, args.repeat, args.timings_only)
+        return 0
+    if not os.path.isdir(args.directory):
+        parser.error(f"no snapshot library at {args.directory}, run with --update first")
+    failures = check(args.directory, paths, args.repeat, args.rtol, args.atol, args.max_slowdown)
+    print(f"\n{failures} failed", file=sys.stdout)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(cli(sys.argv[1:]))
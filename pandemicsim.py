@@ -4,6 +4,7 @@ import json
 import math
 import random
 import pygame
+import numpy as np
 from dataclasses import dataclass
 
 
@@ -444,12 +445,14 @@ class WorldSim:
         self.flights_on = flights_on
         self.boats_on = boats_on
 
+        # Compartments are int64 arrays indexed like countries, so the per-country
+        # updates in step are whole-array operations
         n = len(countries)
-        self.S = [max(0, c.pop) for c in countries]
-        self.I = [0]*n
-        self.R = [0]*n
-        self.V = [0]*n
-        self.D = [0]*n
+        self.S = np.array([max(0, c.pop) for c in countries], dtype=np.int64)
+        self.I = np.zeros(n, dtype=np.int64)
+        self.R = np.zeros(n, dtype=np.int64)
+        self.V = np.zeros(n, dtype=np.int64)
+        self.D = np.zeros(n, dtype=np.int64)
 
         self.name_to_idx = {c.name: i for i, c in enumerate(countries)}
         start_idx = self.name_to_idx.get(start_name, 0)
@@ -469,11 +472,15 @@ class WorldSim:
                     self.neigh[i].append(j)
                     self.neigh[j].append(i)
 
+        # Boats pick a random other coastal country; coast_pos[k] is k's place in coastal
+        self.coastal = [i for i, c in enumerate(countries) if c.coastal]
+        self.coast_pos = {k: pos for pos, k in enumerate(self.coastal)}
+
         self.pulses = []
         self.travel = []
 
     def totals(self):
-        return (sum(self.S), sum(self.I), sum(self.R), sum(self.V), sum(self.D))
+        return (int(self.S.sum()), int(self.I.sum()), int(self.R.sum()), int(self.V.sum()), int(self.D.sum()))
 
     def step(self, dt_real):
         days_dt = (dt_real / DAY_SECONDS_BASE) * self.speed_mult
@@ -502,114 +509,111 @@ class WorldSim:
             vax_rate = vax_rate * (0.35 + 0.65 * ramp)
 
         n = len(self.countries)
+        # Every rate below is >= 0, so each update only has to be capped at what the
+        # compartment it takes from holds
+        S, I, R, V, D = self.S, self.I, self.R, self.V, self.D
 
         if vax_rate > 0:
-            for k in range(n):
-                if self.S[k] <= 0:
-                    continue
-                vacc = int(self.S[k] * vax_rate * days_dt)
-                vacc = clamp(vacc, 0, self.S[k])
-                self.S[k] -= vacc
-                self.V[k] += vacc
-
-        for k in range(n):
-            alive = self.S[k] + self.I[k] + self.R[k] + self.V[k]
-            if alive <= 0 or self.I[k] <= 0 or self.S[k] <= 0:
-                continue
-            pressure = self.I[k] / alive
-            eff = beta * burst
-
-            vacc_frac = (self.V[k] / alive) if alive else 0.0
-            eff *= (1.0 - 0.25 * clamp(vacc_frac * vax_effect, 0, 1))
-
-            new_inf = int(eff * pressure * self.S[k] * days_dt * 2.6)
-            new_inf = clamp(new_inf, 0, self.S[k])
-            if new_inf > 0:
-                self.S[k] -= new_inf
-                self.I[k] += new_inf
-                if random.random() < 0.18:
-                    self.pulses.append(Pulse(self.countries[k].centroid, RED))
+            vacc = np.minimum((S * vax_rate * days_dt).astype(np.int64), S)
+            S -= vacc
+            V += vacc
 
+        # Local infection; pressure stays 0 where nobody is alive or infected, so no
+        # new infections there
+        alive = S + I + R + V
+        spreading = alive > 0
+        pressure = np.divide(I, alive, out=np.zeros(n), where=spreading)
+        vacc_frac = np.divide(V, alive, out=np.zeros(n), where=spreading)
+        eff = beta * burst * (1.0 - 0.25 * np.minimum(vacc_frac * vax_effect, 1.0))
+        new_inf = np.minimum((eff * pressure * S * days_dt * 2.6).astype(np.int64), S)
+        S -= new_inf
+        I += new_inf
+        # Pulses draw their random numbers in country order, like the per-country loop did
+        for k in np.flatnonzero(new_inf > 0):
+            if random.random() < 0.18:
+                self.pulses.append(Pulse(self.countries[k].centroid, RED))
+
+        # Land spread and travel move people between countries in country order (a
+        # country infected earlier in the sweep spreads on in the same step) and draw
+        # random numbers per country, so they stay sequential sweeps, on plain lists
+        # because indexing numpy scalars one at a time is slower
+        S_list, I_list = S.tolist(), I.tolist()
+        spread = land_spread * burst
         for k in range(n):
-            if self.I[k] <= 0:
+            if I_list[k] <= 0:
                 continue
+            rate = spread * (I_list[k] / max(1, self.countries[k].pop))
             for nb in self.neigh[k]:
-                if self.S[nb] <= 0:
+                s = S_list[nb]
+                if s <= 0:
                     continue
-                spill = int(land_spread * burst * (self.I[k] / max(1, self.countries[k].pop)) * self.S[nb] * days_dt * 220)
-                spill = clamp(spill, 0, self.S[nb])
+                spill = min(int(rate * s * days_dt * 220), s)
                 if spill > 0:
-                    self.S[nb] -= spill
-                    self.I[nb] += spill
+                    S_list[nb] -= spill
+                    I_list[nb] += spill
                     if random.random() < 0.08:
                         self.pulses.append(Pulse(self.countries[nb].centroid, RED))
 
         if self.flights_on or self.boats_on:
-            _, I_tot, _, _, _ = self.totals()
-            travel_base = clamp(I_tot / 60_000_000, 0.0, 1.0)
+            travel_base = clamp(sum(I_list) / 60_000_000, 0.0, 1.0)
 
             for k in range(n):
-                if self.I[k] <= 0:
+                if I_list[k] <= 0:
                     continue
 
                 if self.flights_on and random.random() < (0.02 + 0.10 * travel_base) * days_dt:
                     j = random.randrange(n)
-                    if j != k and self.S[j] > 0:
-                        moved = clamp(int(50 + self.I[k] * 0.000002), 10, 900)
-                        moved = clamp(moved, 0, self.S[j])
+                    if j != k and S_list[j] > 0:
+                        moved = clamp(int(50 + I_list[k] * 0.000002), 10, 900)
+                        moved = clamp(moved, 0, S_list[j])
                         if moved > 0:
-                            self.S[j] -= moved
-                            self.I[j] += moved
+                            S_list[j] -= moved
+                            I_list[j] += moved
                             self.travel.append(TravelParticle(self.countries[k].centroid, self.countries[j].centroid, YELLOW, 0.7))
                             self.pulses.append(Pulse(self.countries[j].centroid, RED))
 
                 if self.boats_on and self.countries[k].coastal and random.random() < (0.012 + 0.06 * travel_base) * days_dt:
-                    coastal_idxs = [idx for idx, c in enumerate(self.countries) if c.coastal and idx != k]
-                    if coastal_idxs:
-                        j = random.choice(coastal_idxs)
-                        if self.S[j] > 0:
-                            moved = clamp(int(30 + self.I[k] * 0.0000015), 8, 600)
-                            moved = clamp(moved, 0, self.S[j])
+                    if len(self.coastal) > 1:
+                        # Same draw as random.choice over the coastal countries other than k
+                        pos = random.randrange(len(self.coastal) - 1)
+                        j = self.coastal[pos + (pos >= self.coast_pos[k])]
+                        if S_list[j] > 0:
+                            moved = clamp(int(30 + I_list[k] * 0.0000015), 8, 600)
+                            moved = clamp(moved, 0, S_list[j])
                             if moved > 0:
-                                self.S[j] -= moved
-                                self.I[j] += moved
+                                S_list[j] -= moved
+                                I_list[j] += moved
                                 self.travel.append(TravelParticle(self.countries[k].centroid, self.countries[j].centroid, (120, 255, 190), 1.05))
                                 self.pulses.append(Pulse(self.countries[j].centroid, RED))
 
-        for k in range(n):
-            if self.I[k] <= 0:
-                continue
-
-            death_per_day = fatality / max(1.0, recovery_days)
-            deaths = int(self.I[k] * death_per_day * days_dt)
-            deaths = clamp(deaths, 0, self.I[k])
-            self.I[k] -= deaths
-            self.D[k] += deaths
-
-            rec_per_day = 1.0 / max(1.0, recovery_days)
-            rec = int(self.I[k] * rec_per_day * days_dt)
-            rec = clamp(rec, 0, self.I[k])
-            self.I[k] -= rec
-            self.R[k] += rec
-
-            if immune_escape > 0 and self.R[k] > 0 and self.I[k] > 0:
-                reinf = int(self.R[k] * (immune_escape * 0.01) * days_dt)
-                reinf = clamp(reinf, 0, self.R[k])
-                if reinf > 0:
-                    self.R[k] -= reinf
-                    self.I[k] += reinf
-                    if random.random() < 0.03:
-                        self.pulses.append(Pulse(self.countries[k].centroid, PURPLE))
-
-            if immune_escape > 0 and self.V[k] > 0 and self.I[k] > 0:
-                protection = clamp(vax_effect * (1.0 - immune_escape), 0.0, 1.0)
-                breakthrough = int(self.V[k] * (1.0 - protection) * 0.0015 * days_dt)
-                breakthrough = clamp(breakthrough, 0, self.V[k])
-                if breakthrough > 0:
-                    self.V[k] -= breakthrough
-                    self.I[k] += breakthrough
-                    if random.random() < 0.02:
-                        self.pulses.append(Pulse(self.countries[k].centroid, RED))
+        S[:] = S_list
+        I[:] = I_list
+
+        # Deaths, then recoveries out of who is left infected
+        deaths = np.minimum((I * (fatality / max(1.0, recovery_days)) * days_dt).astype(np.int64), I)
+        I -= deaths
+        D += deaths
+        rec = np.minimum((I * (1.0 / max(1.0, recovery_days)) * days_dt).astype(np.int64), I)
+        I -= rec
+        R += rec
+
+        if immune_escape > 0:
+            reinf = np.minimum((R * (immune_escape * 0.01) * days_dt).astype(np.int64), R)
+            reinf[I <= 0] = 0
+            R -= reinf
+            I += reinf
+
+            protection = clamp(vax_effect * (1.0 - immune_escape), 0.0, 1.0)
+            breakthrough = np.minimum((V * (1.0 - protection) * 0.0015 * days_dt).astype(np.int64), V)
+            breakthrough[I <= 0] = 0
+            V -= breakthrough
+            I += breakthrough
+
+            for k in np.flatnonzero((reinf > 0) | (breakthrough > 0)):
+                if reinf[k] > 0 and random.random() < 0.03:
+                    self.pulses.append(Pulse(self.countries[k].centroid, PURPLE))
+                if breakthrough[k] > 0 and random.random() < 0.02:
+                    self.pulses.append(Pulse(self.countries[k].centroid, RED))
 
         self.pulses = [p for p in self.pulses if not p.update(dt_real)]
         self.travel = [t for t in self.travel if not t.update(dt_real)]